@@ -0,0 +1,38 @@
+"""store file versions as snapshots plus deltas
+
+Revision ID: k8l9m0n1o2p3
+Revises: j7k8l9m0n1o2
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "k8l9m0n1o2p3"
+down_revision: Union[str, None] = "j7k8l9m0n1o2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("file_versions", sa.Column("delta", sa.Text(), nullable=True))
+    op.alter_column("file_versions", "storage_key", existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    # Delta versions have no stored copy, so the old schema can't represent
+    # them, and dropping them would lose history. Refuse instead.
+    deltas = op.get_bind().execute(
+        sa.text("SELECT count(*) FROM file_versions WHERE storage_key IS NULL")
+    ).scalar()
+    if deltas:
+        raise RuntimeError(
+            f"{deltas} file versions are stored as deltas and have no stored copy; "
+            "they must be converted to snapshots before downgrading past k8l9m0n1o2p3"
+        )
+    op.alter_column("file_versions", "storage_key", existing_type=sa.Text(), nullable=False)
+    op.drop_column("file_versions", "delta")
@@ -0,0 +1,73 @@
+"""add partial indexes for file listing queries
+
+Revision ID: l9m0n1o2p3q4
+Revises: k8l9m0n1o2p3
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "l9m0n1o2p3q4"
+down_revision: Union[str, None] = "k8l9m0n1o2p3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Predicates are written exactly as the ORM renders them (IS true, not = true)
+# so the planner can match them against the queries
+LIVE = "deleted_at IS NULL"
+
+# (name, columns, where, using)
+INDEXES = [
+    # list_drive_files and the orphan scan in ensure_system_folders
+    ("ix_files_folder_listing", ["workspace_id", "folder_id", "sort_order", "name"], LIVE, None),
+    # list_all_workspace_files
+    ("ix_files_workspace_name", ["workspace_id", "name"], LIVE, None),
+    # list_favorite_files
+    ("ix_files_workspace_favorites", ["workspace_id", "name"], f"is_favorite IS true AND {LIVE}", None),
+    # get_instances_for_file, related_source_ids @> ARRAY[...]
+    ("ix_files_related_source_ids", ["related_source_ids"], f"is_instance IS true AND {LIVE}", "gin"),
+    # get_instances_for_file, source_file_id = ...; both arms of its OR need
+    # an index for a BitmapOr instead of a sequential scan
+    ("ix_files_instance_sources", ["source_file_id"], f"is_instance IS true AND {LIVE}", None),
+]
+
+# Superseded by ix_files_instance_sources: its "is_instance = true" predicate
+# never matched the queries
+OLD_SOURCE_INDEX = "ix_files_source_file_instances"
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction; build without locking out writes
+    with op.get_context().autocommit_block():
+        for name, columns, where, using in INDEXES:
+            op.create_index(
+                name,
+                "files",
+                columns,
+                postgresql_where=sa.text(where),
+                postgresql_using=using,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.drop_index(
+            OLD_SOURCE_INDEX, table_name="files", postgresql_concurrently=True, if_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            OLD_SOURCE_INDEX,
+            "files",
+            ["source_file_id"],
+            postgresql_where=sa.text("is_instance = true AND deleted_at IS NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for name, *_ in reversed(INDEXES):
+            op.drop_index(name, table_name="files", postgresql_concurrently=True, if_exists=True)
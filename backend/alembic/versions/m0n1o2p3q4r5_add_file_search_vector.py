@@ -0,0 +1,94 @@
+"""add full-text search vector to files
+
+Revision ID: m0n1o2p3q4r5
+Revises: l9m0n1o2p3q4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "m0n1o2p3q4r5"
+down_revision: Union[str, None] = "l9m0n1o2p3q4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept current by the files_search_vector trigger; File.search_vector documents it
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', {0}name), 'A') || "
+    "setweight(to_tsvector('english', left(coalesce({0}content_text, ''), 262144)), 'B')"
+)
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    # A plain nullable column is a catalog-only change; a stored generated
+    # column would rewrite the whole table under an ACCESS EXCLUSIVE lock
+    op.add_column("files", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        f"""
+        CREATE FUNCTION files_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format("NEW.")};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # Installed before the backfill so rows written meanwhile are covered
+    op.execute(
+        "CREATE TRIGGER files_search_vector BEFORE INSERT OR UPDATE OF name, content_text "
+        "ON files FOR EACH ROW EXECUTE FUNCTION files_search_vector()"
+    )
+
+    # Backfill in short transactions, in id order, so no lock is held for long
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = None
+        while True:
+            after = "" if last_id is None else "WHERE id > :last_id"
+            last_id = bind.execute(
+                sa.text(
+                    f"""
+                    WITH batch AS (
+                        SELECT id FROM files {after} ORDER BY id LIMIT {BACKFILL_BATCH}
+                    ), updated AS (
+                        UPDATE files SET search_vector = {SEARCH_VECTOR.format("")}
+                        FROM batch WHERE files.id = batch.id
+                        RETURNING files.id
+                    )
+                    SELECT max(id::text)::uuid FROM updated
+                    """
+                ),
+                {} if last_id is None else {"last_id": last_id},
+            ).scalar()
+            if last_id is None:
+                break
+
+        op.create_index(
+            "ix_files_search_vector",
+            "files",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_files_search_vector",
+            table_name="files",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.execute("DROP TRIGGER IF EXISTS files_search_vector ON files")
+    op.execute("DROP FUNCTION IF EXISTS files_search_vector()")
+    op.drop_column("files", "search_vector")
@@ -0,0 +1,89 @@
+"""add workspace change version and folder path index
+
+Revision ID: n1o2p3q4r5s6
+Revises: m0n1o2p3q4r5
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "n1o2p3q4r5s6"
+down_revision: Union[str, None] = "m0n1o2p3q4r5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Statement-level triggers bump the version once per statement and workspace,
+# however many rows a bulk update touches. Updates see both transition tables
+# so a file moved to another workspace bumps both.
+TRIGGERS = [
+    ("insert", "NEW TABLE AS new_rows"),
+    ("update", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ("delete", "OLD TABLE AS old_rows"),
+]
+
+
+def upgrade() -> None:
+    op.add_column(
+        "workspaces",
+        sa.Column("change_version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        CREATE FUNCTION bump_workspace_change_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE workspaces SET change_version = change_version + 1
+                WHERE id IN (SELECT DISTINCT workspace_id FROM new_rows);
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE workspaces SET change_version = change_version + 1
+                WHERE id IN (SELECT DISTINCT workspace_id FROM old_rows);
+            ELSE
+                UPDATE workspaces SET change_version = change_version + 1
+                WHERE id IN (
+                    SELECT workspace_id FROM new_rows
+                    UNION SELECT workspace_id FROM old_rows
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in ("files", "folders"):
+        for event, referencing in TRIGGERS:
+            op.execute(
+                f"CREATE TRIGGER {table}_change_version_{event} "
+                f"AFTER {event.upper()} ON {table} REFERENCING {referencing} "
+                "FOR EACH STATEMENT EXECUTE FUNCTION bump_workspace_change_version()"
+            )
+
+    # Subtree reads in get_folder_tree are prefix scans on the materialized path
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_folders_workspace_path",
+            "folders",
+            ["workspace_id", "path"],
+            postgresql_ops={"path": "text_pattern_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_folders_workspace_path",
+            table_name="folders",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    for table in ("files", "folders"):
+        for event, _ in TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_change_version_{event} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_workspace_change_version()")
+    op.drop_column("workspaces", "change_version")
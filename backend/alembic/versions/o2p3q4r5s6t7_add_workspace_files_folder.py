@@ -0,0 +1,64 @@
+"""record each workspace's Files folder and re-home orphaned root files
+
+Revision ID: o2p3q4r5s6t7
+Revises: n1o2p3q4r5s6
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "o2p3q4r5s6t7"
+down_revision: Union[str, None] = "n1o2p3q4r5s6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "workspaces",
+        sa.Column("files_folder_id", postgresql.UUID(as_uuid=True), nullable=True),
+    )
+    op.create_foreign_key(
+        "fk_workspaces_files_folder_id",
+        "workspaces",
+        "folders",
+        ["files_folder_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+
+    # Backfill what ensure_system_folders used to redo on every request.
+    # Workspaces without a Files folder yet get one on first use.
+    op.execute(
+        """
+        UPDATE workspaces w SET files_folder_id = f.id
+        FROM (
+            SELECT DISTINCT ON (workspace_id) workspace_id, id
+            FROM folders
+            WHERE parent_id IS NULL AND name = 'Files'
+            ORDER BY workspace_id, created_at
+        ) f
+        WHERE f.workspace_id = w.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE files SET folder_id = w.files_folder_id
+        FROM workspaces w
+        WHERE files.workspace_id = w.id
+          AND w.files_folder_id IS NOT NULL
+          AND files.folder_id IS NULL
+          AND files.deleted_at IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_workspaces_files_folder_id", "workspaces", type_="foreignkey")
+    op.drop_column("workspaces", "files_folder_id")
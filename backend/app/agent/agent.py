@@ -1,3 +1,4 @@
+import html
 import uuid
 from datetime import datetime, timezone
 
@@ -7,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.agent.system_prompt import SYSTEM_PROMPT
 from app.agent.tools import TOOLS
 from app.models.file import File
-from app.services import file_service, marketplace_service
+from app.services import blob_service, file_service, marketplace_service
 from app.filestore.base import StorageBackend
 from app.websocket.manager import ConnectionManager
 
@@ -217,8 +218,10 @@ class PlainerAgent:
             return "Reading file"
         elif tool_name == "list_files":
             return "Listing files"
+        elif tool_name == "search_files":
+            return f"Searching for {tool_input.get('query', '')}"
         elif tool_name == "delete_file":
-            return "Deleting file"
+            return "Deleting files" if tool_input.get("file_ids") else "Deleting file"
         elif tool_name == "create_instance":
             return f"Creating {tool_input.get('app_type_slug', '')} instance"
         elif tool_name == "create_app_type":
@@ -233,7 +236,7 @@ class PlainerAgent:
 
     async def _execute_tool(self, tool_name: str, tool_input: dict) -> str:
         if tool_name == "create_file":
-            files_folder = await file_service.ensure_system_folders(
+            files_folder_id = await file_service.ensure_system_folders(
                 self.db, self.workspace_id, self.owner_id
             )
             name = tool_input["name"]
@@ -245,7 +248,7 @@ class PlainerAgent:
                 name=name,
                 content=tool_input["content"],
                 owner_id=self.owner_id,
-                folder_id=files_folder.id,
+                folder_id=files_folder_id,
                 created_by_agent=True,
             )
 
@@ -304,6 +307,20 @@ class PlainerAgent:
                     parts.append(f"      ↳ {inst.name} (ID: {inst.id}, instance)")
             return "My Files/\n" + "\n".join(parts)
 
+        elif tool_name == "search_files":
+            limit = min(int(tool_input.get("limit", 10)), 50)
+            hits = await file_service.search_files(
+                self.db, self.workspace_id, tool_input["query"], limit=limit
+            )
+            if not hits:
+                return "No matching files"
+            parts = []
+            for f, _, snippet in hits:
+                parts.append(f"  - {f.name} (ID: {f.id}, type: {f.file_type})")
+                if snippet:
+                    parts.append(f"      {' '.join(html.unescape(snippet).split())}")
+            return "\n".join(parts)
+
         elif tool_name == "edit_file":
             file = await file_service.get_file_by_id(
                 self.db, uuid.UUID(tool_input["file_id"])
@@ -311,39 +328,14 @@ class PlainerAgent:
             if file is None:
                 return "Error: File not found"
 
-            # Update content
-            new_content = tool_input["new_content"]
-            content_bytes = new_content.encode("utf-8")
-            new_key = f"{self.workspace_id}/{uuid.uuid4()}/{file.name}"
-            await self.storage.put(new_key, content_bytes)
-
-            file.storage_key = new_key
-            file.size_bytes = len(content_bytes)
-            file.content_text = new_content
-            file.updated_at = datetime.now(timezone.utc)
-
-            # Create version
-            from app.models.file import FileVersion
-            from sqlalchemy import func, select
-
-            max_ver = await self.db.execute(
-                select(func.max(FileVersion.version_number)).where(
-                    FileVersion.file_id == file.id
-                )
-            )
-            next_version = (max_ver.scalar() or 0) + 1
-
-            version = FileVersion(
-                file_id=file.id,
-                version_number=next_version,
-                storage_key=new_key,
-                size_bytes=len(content_bytes),
-                content_text=new_content,
+            file, version = await file_service.update_file_content(
+                self.db,
+                self.storage,
+                file,
+                tool_input["new_content"],
                 change_summary=tool_input.get("change_summary"),
                 created_by_agent=True,
-                created_at=datetime.now(timezone.utc),
             )
-            self.db.add(version)
             await self.db.commit()
 
             await self.ws_manager.send_to_workspace(
@@ -357,25 +349,46 @@ class PlainerAgent:
                     },
                 },
             )
-            return f"File '{file.name}' updated (version {next_version})"
+            return f"File '{file.name}' updated (version {version.version_number})"
 
         elif tool_name == "delete_file":
-            file = await file_service.get_file_by_id(
-                self.db, uuid.UUID(tool_input["file_id"])
-            )
-            if file is None:
+            raw_ids = tool_input.get("file_ids") or [tool_input.get("file_id")]
+            try:
+                file_ids = [uuid.UUID(fid) for fid in raw_ids if fid]
+            except ValueError:
+                return "Error: Invalid file ID"
+            if not file_ids:
+                return "Error: file_id or file_ids is required"
+            deleted = await file_service.delete_files(self.db, self.workspace_id, file_ids)
+            if not deleted:
                 return "Error: File not found"
-            file.deleted_at = datetime.now(timezone.utc)
             await self.db.commit()
 
+            if len(deleted) == 1:
+                file_id, name = deleted[0]
+                await self.ws_manager.send_to_workspace(
+                    self.workspace_id,
+                    {
+                        "type": "file.deleted",
+                        "payload": {"file_id": str(file_id), "name": name},
+                    },
+                )
+                return f"File '{name}' deleted"
+
             await self.ws_manager.send_to_workspace(
                 self.workspace_id,
                 {
-                    "type": "file.deleted",
-                    "payload": {"file_id": str(file.id), "name": file.name},
+                    "type": "files.batch",
+                    "payload": {
+                        "action": "deleted",
+                        "file_ids": [str(file_id) for file_id, _ in deleted],
+                        "folder_id": None,
+                    },
                 },
             )
-            return f"File '{file.name}' deleted"
+            missing = len(file_ids) - len(deleted)
+            summary = f"Deleted {len(deleted)} files"
+            return summary + (f" ({missing} not found)" if missing else "")
 
         elif tool_name == "create_instance":
             # Support both source_file_id (single) and source_file_ids (multi-file)
@@ -470,8 +483,8 @@ class PlainerAgent:
             if "content" in tool_input:
                 new_content = tool_input["content"]
                 content_bytes = new_content.encode("utf-8")
-                new_key = f"{self.workspace_id}/{uuid.uuid4()}/{instance.name}"
-                await self.storage.put(new_key, content_bytes)
+                new_key = await blob_service.store_blob(self.db, self.storage, content_bytes)
+                await blob_service.release_blob(self.db, instance.storage_key)
                 instance.content_text = new_content
                 instance.storage_key = new_key
                 instance.size_bytes = len(content_bytes)
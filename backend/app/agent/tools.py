@@ -76,12 +76,35 @@ TOOLS = [
             "required": [],
         },
     },
+    {
+        "name": "search_files",
+        "description": (
+            "Search file names and contents in the workspace, best matches first. "
+            "Use this to find files about a topic instead of reading every file. "
+            "Supports \"quoted phrases\", OR and -excluded words."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of results (default 10)",
+                },
+            },
+            "required": ["query"],
+        },
+    },
     {
         "name": "delete_file",
         "description": (
-            "Delete a file from the workspace. This works for both data files "
+            "Delete files from the workspace. This works for both data files "
             "and view files. This is a soft delete. Use when the user asks to "
-            "delete, remove, or clear files."
+            "delete, remove, or clear files. Pass file_ids to delete many files "
+            "in one call."
         ),
         "input_schema": {
             "type": "object",
@@ -90,8 +113,13 @@ TOOLS = [
                     "type": "string",
                     "description": "The UUID of the file to delete",
                 },
+                "file_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "UUIDs of several files to delete at once",
+                },
             },
-            "required": ["file_id"],
+            "required": [],
         },
     },
     {
@@ -59,12 +59,12 @@ async def register(
                 select(Workspace).where(Workspace.owner_id == user.id)
             )
             workspace = ws.scalar_one()
-            files_folder = await ensure_system_folders(db, workspace.id, user.id)
+            files_folder_id = await ensure_system_folders(db, workspace.id, user.id)
             # Commit user + workspace + folders NOW so the background task can see them
             await db.commit()
             logger.info("Scheduling background seed for user %s", user.id)
             background_tasks.add_task(
-                _seed_in_background, workspace.id, user.id, files_folder.id,
+                _seed_in_background, workspace.id, user.id, files_folder_id,
             )
         except Exception:
             logger.exception("Failed to set up folders for user %s", user.id)
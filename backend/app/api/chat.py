@@ -4,8 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.dependencies import get_current_user
-from app.models.user import User
+from app.dependencies import Principal, get_current_principal
 from app.schemas.chat import ConversationCreate, ConversationResponse, MessageCreate, MessageResponse
 from app.services import chat_service, workspace_service
 
@@ -15,7 +14,7 @@ router = APIRouter(prefix="/workspaces/{workspace_id}", tags=["chat"])
 @router.get("/conversations", response_model=list[ConversationResponse])
 async def list_conversations(
     workspace_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -33,7 +32,7 @@ async def list_conversations(
 async def create_conversation(
     workspace_id: uuid.UUID,
     data: ConversationCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -54,7 +53,7 @@ async def create_conversation(
 async def list_messages(
     workspace_id: uuid.UUID,
     conversation_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -79,7 +78,7 @@ async def send_message(
     workspace_id: uuid.UUID,
     conversation_id: uuid.UUID,
     data: MessageCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -1,22 +1,39 @@
 import uuid
+from collections.abc import AsyncIterator
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import FileResponse as PathResponse, StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import Principal, get_current_principal, get_storage
+from app.config import settings
+from app.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, next_cursor
 from app.models.user import User
 from app.schemas.file import (
     AppTypeCreate,
     AppTypeResponse,
+    BulkFileRequest,
+    BulkFileResponse,
+    BulkMoveRequest,
     DriveResponse,
     FileContentResponse,
     FileContentUpdate,
     FileCreate,
     FileResponse,
+    FileSearchResult,
+    FileVersionContentResponse,
+    FileVersionResponse,
+    DownloadUrlResponse,
+    UploadCompleteRequest,
+    UploadUrlRequest,
+    UploadUrlResponse,
     FolderCreate,
     FolderResponse,
+    FolderTreeNode,
+    FolderTreeResponse,
     InstanceConfigUpdate,
     InstanceCreate,
     ReorderRequest,
@@ -24,15 +41,50 @@ from app.schemas.file import (
     ShareResponse,
 )
 from app.schemas.chat import ConversationCreate, ConversationResponse, MessageResponse
-from app.services import file_service, chat_service
-from app.filestore.local import LocalStorageBackend
-from app.config import settings
+from app.services import file_service, chat_service, version_service
+from app.filestore.base import STREAM_CHUNK_SIZE
+from app.websocket.manager import ws_manager
 
 router = APIRouter(prefix="/drive", tags=["drive"])
 
 
-def get_storage() -> LocalStorageBackend:
-    return LocalStorageBackend(settings.storage_local_path)
+async def _iter_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into inclusive (start, end) offsets.
+
+    Returns None when the whole file should be served (no header, multiple
+    ranges or an unparseable value). Raises 416 if the range can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_s), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def _set_next_cursor(response: Response, rows: list, keys, limit: int | None) -> None:
+    cursor = next_cursor(rows, keys, limit)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
 
 
 def _file_response(file) -> FileResponse:
@@ -66,18 +118,18 @@ def _file_response(file) -> FileResponse:
 
 @router.get("", response_model=DriveResponse)
 async def get_my_drive(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Get the current user's personal drive."""
     drive = await file_service.get_user_drive(db, user.id)
-    files_folder = await file_service.ensure_system_folders(db, drive.id, user.id)
+    files_folder_id = await file_service.ensure_system_folders(db, drive.id, user.id)
     await db.commit()
     return DriveResponse(
         id=drive.id,
         name=drive.name,
         owner_id=drive.owner_id,
-        files_folder_id=files_folder.id,
+        files_folder_id=files_folder_id,
     )
 
 
@@ -85,29 +137,49 @@ async def get_my_drive(
 
 @router.get("/files", response_model=list[FileResponse])
 async def list_files(
+    response: Response,
     folder_id: uuid.UUID | None = None,
-    user: User = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
-    files = await file_service.list_drive_files(db, drive.id, folder_id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    files = await file_service.list_drive_files(db, drive.id, folder_id, limit, cursor)
+    _set_next_cursor(response, files, file_service.FOLDER_ORDER, limit)
     return [_file_response(f) for f in files]
 
 
+@router.get("/search", response_model=list[FileSearchResult])
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Full-text search over file names and contents, best matches first."""
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    hits = await file_service.search_files(db, drive.id, q, limit, offset)
+    return [
+        FileSearchResult(**_file_response(f).model_dump(), rank=rank, snippet=snippet)
+        for f, rank, snippet in hits
+    ]
+
+
 @router.post("/files", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
 async def create_file(
     data: FileCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     storage = get_storage()
 
     # Default folder: Files root folder
     folder_id = data.folder_id
     if folder_id is None:
-        files_folder = await file_service.ensure_system_folders(db, drive.id, user.id)
-        folder_id = files_folder.id
+        folder_id = await file_service.ensure_system_folders(db, drive.id, user.id)
 
     file = await file_service.create_file_from_content(
         db=db,
@@ -130,7 +202,7 @@ async def create_file(
 @router.get("/files/{file_id}", response_model=FileResponse)
 async def get_file(
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     file = await file_service.get_file_by_id(db, file_id)
@@ -142,7 +214,7 @@ async def get_file(
 @router.get("/files/{file_id}/content", response_model=FileContentResponse)
 async def get_file_content(
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     file = await file_service.get_file_by_id(db, file_id)
@@ -165,11 +237,58 @@ async def get_file_content(
     )
 
 
+@router.get("/files/{file_id}/download")
+async def download_file(
+    file_id: uuid.UUID,
+    range_header: str | None = Header(default=None, alias="Range"),
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream the stored bytes of a file (original upload, not converted HTML).
+
+    Supports a single ``Range: bytes=`` request and answers 206 Partial Content.
+    Files on the local backend are served straight from disk.
+    """
+    file = await file_service.get_file_by_id(db, file_id)
+    if file is None or file.owner_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    storage = get_storage()
+    path = await storage.local_path(file.storage_key)
+    if path is not None:
+        # Starlette answers Range itself and hands the file to the server
+        # (sendfile/pathsend where supported) instead of copying it through Python
+        return PathResponse(path, media_type=file.mime_type, filename=file.name)
+
+    byte_range = _parse_range(range_header, file.size_bytes)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file.name)}",
+    }
+    if byte_range is None:
+        stream = await file_service.get_file_stream(storage, file)
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        stream = await file_service.get_file_stream(
+            storage, file, offset=start, length=end - start + 1
+        )
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{file.size_bytes}"
+        headers["Content-Length"] = str(end - start + 1)
+    if stream is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found")
+
+    return StreamingResponse(
+        stream, status_code=status_code, media_type=file.mime_type, headers=headers
+    )
+
+
 @router.put("/files/{file_id}/content", response_model=FileContentResponse)
 async def update_file_content(
     file_id: uuid.UUID,
     data: FileContentUpdate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Save updated content (e.g. from the WYSIWYG editor)."""
@@ -178,7 +297,7 @@ async def update_file_content(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
     storage = get_storage()
-    file = await file_service.update_file_content(
+    file, _ = await file_service.update_file_content(
         db, storage, file, data.content, updated_by_id=user.id
     )
     await db.commit()
@@ -188,33 +307,66 @@ async def update_file_content(
     )
 
 
+@router.get("/files/{file_id}/versions", response_model=list[FileVersionResponse])
+async def list_file_versions(
+    file_id: uuid.UUID,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    file = await file_service.get_file_by_id(db, file_id)
+    if file is None or file.owner_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return await file_service.list_file_versions(db, file_id)
+
+
+@router.get(
+    "/files/{file_id}/versions/{version_number}",
+    response_model=FileVersionContentResponse,
+)
+async def get_file_version_content(
+    file_id: uuid.UUID,
+    version_number: int,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Text of a past version, rebuilt from its snapshot and diffs."""
+    file = await file_service.get_file_by_id(db, file_id)
+    if file is None or file.owner_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    content = await version_service.get_version_content(db, file_id, version_number)
+    if content is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Version not found")
+    return FileVersionContentResponse(
+        file_id=file_id, version_number=version_number, content=content
+    )
+
+
 @router.post("/files/upload", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     file: UploadFile,
     folder_id: str | None = Form(default=None),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Upload a binary file (e.g. .docx)."""
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     storage = get_storage()
 
-    data = await file.read()
     name = file.filename or "untitled"
 
     fid = None
     if folder_id:
         fid = uuid.UUID(folder_id)
     else:
-        files_folder = await file_service.ensure_system_folders(db, drive.id, user.id)
-        fid = files_folder.id
+        fid = await file_service.ensure_system_folders(db, drive.id, user.id)
 
-    new_file = await file_service.create_file_from_binary(
+    new_file = await file_service.create_file_from_stream(
         db=db,
         storage=storage,
         workspace_id=drive.id,
         name=name,
-        data=data,
+        chunks=_iter_upload(file),
         owner_id=user.id,
         folder_id=fid,
         created_by_id=user.id,
@@ -227,25 +379,254 @@ async def upload_file(
     return _file_response(new_file)
 
 
+@router.post("/files/upload-url", response_model=UploadUrlResponse)
+async def create_upload_url(
+    data: UploadUrlRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Presigned URL for uploading straight to storage; finish with /files/upload-complete."""
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    storage = get_storage()
+    storage_key = file_service.upload_key(drive.id, data.name)
+    expires_in = settings.s3_presigned_url_expiry
+    presigned = await storage.presigned_put_url(storage_key, expires_in, sha256=data.sha256)
+    if presigned is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Direct uploads are not supported by this storage backend",
+        )
+    upload_url, headers = presigned
+    return UploadUrlResponse(
+        upload_url=upload_url, storage_key=storage_key, headers=headers, expires_in=expires_in
+    )
+
+
+@router.post(
+    "/files/upload-complete", response_model=FileResponse, status_code=status.HTTP_201_CREATED
+)
+async def complete_upload(
+    data: UploadCompleteRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create the file for an object uploaded with a presigned URL, after checking it."""
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    if not data.storage_key.startswith(f"{drive.id}/uploads/"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+    storage = get_storage()
+    storage_key = await file_service.accept_uploaded_object(
+        storage, data.storage_key, drive.id, data.name, data.size_bytes, data.sha256
+    )
+    if storage_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded object is missing or doesn't match the given size and checksum",
+        )
+
+    fid = data.folder_id
+    if fid is None:
+        fid = await file_service.ensure_system_folders(db, drive.id, user.id)
+
+    new_file = await file_service.create_file_from_uploaded_object(
+        db=db,
+        storage=storage,
+        workspace_id=drive.id,
+        name=data.name,
+        storage_key=storage_key,
+        size_bytes=data.size_bytes,
+        owner_id=user.id,
+        folder_id=fid,
+        created_by_id=user.id,
+    )
+    await file_service.auto_create_instances_for_file(db, storage, new_file)
+
+    await db.commit()
+    return _file_response(new_file)
+
+
+@router.get("/files/{file_id}/download-url", response_model=DownloadUrlResponse)
+async def get_download_url(
+    file_id: uuid.UUID,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """Presigned URL for downloading a file's bytes straight from storage."""
+    file = await file_service.get_file_by_id(db, file_id)
+    if file is None or file.owner_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    storage = get_storage()
+    expires_in = settings.s3_presigned_url_expiry
+    url = await storage.presigned_get_url(file.storage_key, expires_in, filename=file.name)
+    if url is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Direct downloads are not available for this file",
+        )
+    return DownloadUrlResponse(url=url, expires_in=expires_in)
+
+
+# ── Bulk file operations ────────────────────────────────
+
+async def _broadcast_batch(
+    workspace_id: uuid.UUID,
+    action: str,
+    file_ids: list[uuid.UUID],
+    folder_id: uuid.UUID | None = None,
+) -> None:
+    """One ``files.batch`` event for a whole bulk operation instead of one per file."""
+    if not file_ids:
+        return
+    await ws_manager.send_to_workspace(
+        workspace_id,
+        {
+            "type": "files.batch",
+            "payload": {
+                "action": action,
+                "file_ids": [str(i) for i in file_ids],
+                "folder_id": str(folder_id) if folder_id else None,
+            },
+        },
+    )
+
+
+@router.post("/files/bulk/move", response_model=BulkFileResponse)
+async def bulk_move_files(
+    data: BulkMoveRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    try:
+        moved = await file_service.move_files(db, drive.id, data.file_ids, data.folder_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await db.commit()
+    await _broadcast_batch(drive.id, "moved", moved, data.folder_id)
+    return BulkFileResponse(file_ids=moved)
+
+
+@router.post("/files/bulk/delete", response_model=BulkFileResponse)
+async def bulk_delete_files(
+    data: BulkFileRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    rows = await file_service.delete_files(db, drive.id, data.file_ids)
+    deleted = [file_id for file_id, _ in rows]
+    await db.commit()
+    await _broadcast_batch(drive.id, "deleted", deleted)
+    return BulkFileResponse(file_ids=deleted)
+
+
+@router.post("/files/bulk/restore", response_model=BulkFileResponse)
+async def bulk_restore_files(
+    data: BulkFileRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    restored = await file_service.restore_files(db, drive.id, data.file_ids)
+    await db.commit()
+    await _broadcast_batch(drive.id, "restored", restored)
+    return BulkFileResponse(file_ids=restored)
+
+
+@router.post(
+    "/files/bulk/copy", response_model=BulkFileResponse, status_code=status.HTTP_201_CREATED
+)
+async def bulk_copy_files(
+    data: BulkMoveRequest,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    try:
+        copies = await file_service.copy_files(
+            db, drive.id, data.file_ids, data.folder_id, user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await db.commit()
+    await _broadcast_batch(drive.id, "created", copies, data.folder_id)
+    return BulkFileResponse(file_ids=copies)
+
+
 # ── Folders ─────────────────────────────────────────────
 
 @router.get("/folders", response_model=list[FolderResponse])
 async def list_folders(
     parent_id: uuid.UUID | None = None,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     return await file_service.list_drive_folders(db, drive.id, parent_id)
 
 
+@router.get("/tree", response_model=FolderTreeResponse)
+async def get_folder_tree(
+    folder_id: uuid.UUID | None = None,
+    stats: bool = False,
+    if_none_match: str | None = Header(None),
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """The whole folder hierarchy (or the subtree under ``folder_id``) in one response.
+
+    The ETag is the workspace change version, so clients can revalidate with
+    If-None-Match and get a 304 until a file or folder changes.
+    """
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    # Read the version before the tree: a concurrent change then at worst
+    # makes the next request refetch, never serves a stale tree as current
+    version = await file_service.get_workspace_change_version(db, drive.id)
+    etag = f'W/"{version}-{folder_id or "root"}-{int(stats)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        rows = await file_service.get_folder_tree(db, drive.id, folder_id, stats)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    nodes: dict[uuid.UUID, FolderTreeNode] = {}
+    for folder, file_count, size_bytes in rows:
+        nodes[folder.id] = FolderTreeNode(
+            id=folder.id,
+            parent_id=folder.parent_id,
+            name=folder.name,
+            path=folder.path,
+            is_favorite=folder.is_favorite,
+            sort_order=folder.sort_order,
+            file_count=file_count,
+            size_bytes=size_bytes,
+        )
+    top: list[FolderTreeNode] = []
+    for node in nodes.values():
+        parent = nodes.get(node.parent_id) if node.parent_id else None
+        (parent.children if parent else top).append(node)
+    for node in nodes.values():
+        node.children.sort(key=lambda n: (n.sort_order, n.name))
+    top.sort(key=lambda n: (n.sort_order, n.name))
+
+    body = FolderTreeResponse(version=version, folders=top)
+    return Response(
+        content=body.model_dump_json(), media_type="application/json", headers=headers
+    )
+
+
 @router.post("/folders", response_model=FolderResponse, status_code=status.HTTP_201_CREATED)
 async def create_folder(
     data: FolderCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     folder = await file_service.create_folder(
         db=db,
         workspace_id=drive.id,
@@ -262,7 +643,7 @@ async def create_folder(
 @router.put("/files/{file_id}/favorite", response_model=FileResponse)
 async def toggle_file_favorite(
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -276,7 +657,7 @@ async def toggle_file_favorite(
 @router.put("/folders/{folder_id}/favorite", response_model=FolderResponse)
 async def toggle_folder_favorite(
     folder_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     try:
@@ -289,19 +670,24 @@ async def toggle_folder_favorite(
 
 @router.get("/favorites/files", response_model=list[FileResponse])
 async def list_favorite_files(
-    user: User = Depends(get_current_user),
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
-    return await file_service.list_favorite_files(db, drive.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    files = await file_service.list_favorite_files(db, drive.id, limit, cursor)
+    _set_next_cursor(response, files, file_service.NAME_ORDER, limit)
+    return files
 
 
 @router.get("/favorites/folders", response_model=list[FolderResponse])
 async def list_favorite_folders(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     return await file_service.list_favorite_folders(db, drive.id)
 
 
@@ -309,22 +695,22 @@ async def list_favorite_folders(
 
 @router.get("/app-types", response_model=list[AppTypeResponse])
 async def list_app_types(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """List all available app types (global + workspace-specific)."""
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     return await file_service.list_app_types(db, drive.id)
 
 
 @router.post("/app-types", response_model=AppTypeResponse, status_code=status.HTTP_201_CREATED)
 async def create_app_type(
     data: AppTypeCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Create a custom app type."""
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     app_type = await file_service.create_app_type(
         db=db,
         workspace_id=drive.id,
@@ -344,20 +730,26 @@ async def create_app_type(
 
 @router.get("/instances", response_model=list[FileResponse])
 async def list_instances(
+    response: Response,
     app_type_slug: str | None = None,
-    user: User = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """List all instances, optionally filtered by app type slug."""
-    drive = await file_service.get_user_drive(db, user.id)
-    instances = await file_service.list_instances_by_app_type(db, drive.id, app_type_slug)
+    drive = await file_service.get_user_drive_ref(db, user.id)
+    instances = await file_service.list_instances_by_app_type(
+        db, drive.id, app_type_slug, limit, cursor
+    )
+    _set_next_cursor(response, instances, file_service.NAME_ORDER, limit)
     return [_file_response(i) for i in instances]
 
 
 @router.get("/files/{file_id}/instances", response_model=list[FileResponse])
 async def get_file_instances(
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Get all instances linked to a data file."""
@@ -371,11 +763,11 @@ async def get_file_instances(
 @router.post("/instances", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
 async def create_instance(
     data: InstanceCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Create an instance for a data file."""
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     storage = get_storage()
 
     # Resolve app type
@@ -412,7 +804,7 @@ async def create_instance(
 async def update_instance_config(
     instance_id: uuid.UUID,
     data: InstanceConfigUpdate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Update an instance's config JSON."""
@@ -432,19 +824,27 @@ async def update_instance_config(
 
 @router.get("/shared", response_model=list[FileResponse])
 async def list_shared_with_me(
-    user: User = Depends(get_current_user),
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    files = await file_service.list_shared_with_me(db, user.id)
+    files = await file_service.list_shared_with_me(db, user.id, limit, cursor)
+    _set_next_cursor(response, files, file_service.NAME_ORDER, limit)
     return [_file_response(f) for f in files]
 
 
 @router.get("/recent", response_model=list[FileResponse])
 async def list_recent(
-    user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    files = await file_service.list_recent_files(db, user.id)
+    files = await file_service.list_recent_files(db, user.id, limit, cursor)
+    _set_next_cursor(response, files, file_service.RECENT_ORDER, limit)
     return [_file_response(f) for f in files]
 
 
@@ -452,7 +852,7 @@ async def list_recent(
 async def share_file(
     file_id: uuid.UUID,
     data: ShareRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     file = await file_service.get_file_by_id(db, file_id)
@@ -476,20 +876,20 @@ async def share_file(
 
 @router.get("/conversations", response_model=list[ConversationResponse])
 async def list_conversations(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     return await chat_service.get_workspace_conversations(db, drive.id)
 
 
 @router.post("/conversations", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     data: ConversationCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     conversation = await chat_service.create_conversation(db, drive.id, user.id, data.title)
     await db.commit()
     return conversation
@@ -498,10 +898,10 @@ async def create_conversation(
 @router.get("/conversations/{conversation_id}/messages", response_model=list[MessageResponse])
 async def list_messages(
     conversation_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     conversation = await chat_service.get_conversation_by_id(db, conversation_id)
     if conversation is None or conversation.workspace_id != drive.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
@@ -513,10 +913,10 @@ async def list_messages(
 @router.put("/files/reorder")
 async def reorder_files(
     data: ReorderRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     await file_service.reorder_files(db, drive.id, data.items)
     await db.commit()
     return {"ok": True}
@@ -525,10 +925,10 @@ async def reorder_files(
 @router.put("/folders/reorder")
 async def reorder_folders(
     data: ReorderRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
     await file_service.reorder_folders(db, drive.id, data.items)
     await db.commit()
     return {"ok": True}
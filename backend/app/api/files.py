@@ -5,8 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.services import file_service, workspace_service
-from app.dependencies import get_current_user, get_storage
-from app.models.user import User
+from app.dependencies import Principal, get_current_principal, get_storage
 from app.schemas.file import FileCreate, FileContentResponse, FileResponse, FolderCreate, FolderResponse
 from app.config import settings
 
@@ -20,7 +19,7 @@ router = APIRouter(prefix="/workspaces/{workspace_id}", tags=["files"])
 async def list_files(
     workspace_id: uuid.UUID,
     folder_id: uuid.UUID | None = None,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -34,7 +33,7 @@ async def list_files(
 async def create_file(
     workspace_id: uuid.UUID,
     data: FileCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -59,7 +58,7 @@ async def create_file(
 async def get_file(
     workspace_id: uuid.UUID,
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -76,7 +75,7 @@ async def get_file(
 async def get_file_content(
     workspace_id: uuid.UUID,
     file_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
@@ -99,7 +98,7 @@ async def get_file_content(
 async def list_folders(
     workspace_id: uuid.UUID,
     parent_id: uuid.UUID | None = None,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     workspace = await workspace_service.get_workspace_by_id(db, workspace_id, user.id)
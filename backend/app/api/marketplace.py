@@ -5,9 +5,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.dependencies import get_current_user, get_storage
+from app.dependencies import Principal, get_current_principal, get_storage
 from app.filestore.base import StorageBackend
-from app.models.user import User
 from app.schemas.marketplace import (
     MarketplaceItemCreate,
     MarketplaceItemDetail,
@@ -37,7 +36,7 @@ async def list_items(
 @router.get("/mine", response_model=list[MarketplaceItemResponse])
 async def list_my_items(
     item_type: str | None = None,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """List current user's custom items."""
@@ -62,7 +61,7 @@ async def get_item(
 async def use_item(
     item_id: uuid.UUID,
     data: MarketplaceUseRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
     storage: StorageBackend = Depends(get_storage),
 ):
@@ -71,13 +70,12 @@ async def use_item(
     if item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
-    drive = await file_service.get_user_drive(db, user.id)
+    drive = await file_service.get_user_drive_ref(db, user.id)
 
     # Determine target folder
     folder_id = data.folder_id
     if folder_id is None and item.item_type in ("file_template",):
-        files_folder = await file_service.ensure_system_folders(db, drive.id, user.id)
-        folder_id = files_folder.id
+        folder_id = await file_service.ensure_system_folders(db, drive.id, user.id)
 
     if item.item_type == "file_template":
         result = await marketplace_service.use_file_template(
@@ -89,8 +87,7 @@ async def use_item(
     elif item.item_type == "folder_template":
         parent_id = folder_id
         if parent_id is None:
-            files_folder = await file_service.ensure_system_folders(db, drive.id, user.id)
-            parent_id = files_folder.id
+            parent_id = await file_service.ensure_system_folders(db, drive.id, user.id)
         result = await marketplace_service.use_folder_template(
             db, storage, item, drive.id, user.id, parent_id
         )
@@ -121,7 +118,7 @@ async def use_item(
 @router.post("/{item_id}/submit", response_model=MarketplaceItemDetail)
 async def submit_item(
     item_id: uuid.UUID,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Submit a user-created item for marketplace review."""
@@ -138,7 +135,7 @@ async def submit_item(
 @router.post("", response_model=MarketplaceItemDetail, status_code=status.HTTP_201_CREATED)
 async def create_item(
     data: MarketplaceItemCreate,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """Create a user-submitted marketplace item."""
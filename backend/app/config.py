@@ -18,12 +18,65 @@ class Settings(BaseSettings):
     anthropic_api_key: str = ""
 
     # Storage
-    storage_backend: str = "local"
+    storage_backend: str = "local"  # local, s3, memory or simulated
     storage_local_path: str = "./storage"
+    # fsync local writes before they are renamed into place
+    storage_local_fsync: bool = False
     s3_bucket_name: str = ""
     s3_endpoint_url: str = ""
     s3_access_key_id: str = ""
     s3_secret_access_key: str = ""
+    s3_max_pool_connections: int = 50
+    s3_keepalive_timeout: int = 60
+    s3_multipart_threshold: int = 16 * 1024 * 1024
+    s3_multipart_part_size: int = 8 * 1024 * 1024
+    s3_multipart_concurrency: int = 4
+    # Hedged GETs: resend a GET slower than the given latency percentile,
+    # for at most s3_hedge_max_rate of requests
+    s3_hedged_reads: bool = False
+    s3_hedge_percentile: float = 0.95
+    s3_hedge_max_rate: float = 0.05
+    s3_hedge_initial_delay_ms: int = 50
+    # Lifetime of presigned direct upload/download URLs (S3 only)
+    s3_presigned_url_expiry: int = 900
+    # Requests in flight for put_many/get_many/delete_many
+    storage_batch_concurrency: int = 16
+    # JSON latency/bandwidth/error profile for storage_backend="simulated"
+    storage_simulated_profile: str = ""
+
+    # Pack objects below the size limit into local segment files (disabled
+    # when the path is empty). Not allowed with the s3 backend; uvicorn
+    # workers and the GC command on the same host can share the directory
+    storage_pack_path: str = ""
+    storage_pack_max_object_bytes: int = 64 * 1024
+    storage_pack_segment_bytes: int = 64 * 1024 * 1024
+    storage_pack_compact_interval: int = 300
+
+    # Transparent zlib compression of stored objects (reads handle both forms)
+    storage_compression: bool = False
+    storage_compression_threshold: int = 1024
+    storage_compression_level: int = 6
+
+    # Read-through storage cache (disabled when both sizes are 0)
+    storage_cache_memory_bytes: int = 0
+    storage_cache_max_object_bytes: int = 4 * 1024 * 1024
+    storage_cache_disk_path: str = ""
+    storage_cache_disk_bytes: int = 0
+
+    # Storage garbage collection (python -m app.services.gc_service)
+    storage_gc_grace_hours: float = 24
+    storage_gc_deletes_per_second: float = 50
+    # Hard-delete files soft-deleted this many days ago (0 = keep them forever)
+    storage_gc_deleted_retention_days: int = 0
+
+    # File versions: full snapshot every N versions, line deltas in between
+    file_version_snapshot_interval: int = 10
+
+    # Seconds to cache a user's drive and its Files folder in-process (0 disables)
+    drive_cache_ttl: int = 300
+    # Seconds to cache the authenticated user per token subject (0 disables).
+    # Bounds how long a deactivation made outside the API takes to apply.
+    principal_cache_ttl: int = 30
 
     # Redis
     redis_url: str = "redis://localhost:6380"
@@ -1,27 +1,80 @@
 import uuid
+from dataclasses import dataclass
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from app.cache import TTLCache
 from app.config import settings
 from app.database import get_db
 
 from app.models.user import User
+from app.models.workspace import WorkspaceMember
 from app.filestore.base import StorageBackend
+from app.filestore.cache import CachingStorageBackend
+from app.filestore.compression import CompressingStorageBackend
 from app.filestore.local import LocalStorageBackend
+from app.filestore.memory import InMemoryStorageBackend
+from app.filestore.packfile import PackfileStorageBackend
 from app.filestore.s3 import S3StorageBackend
+from app.filestore.simulated import SimulatedLatencyStorageBackend
 
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    token = credentials.credentials
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as read-only endpoints see it."""
+
+    id: uuid.UUID
+    email: str
+    display_name: str
+    is_active: bool
+
+
+# user id -> principal. Evicted when this process commits a change to the user
+# or their memberships; changes made elsewhere apply once the entry expires.
+_principal_cache: TTLCache[uuid.UUID, Principal] = TTLCache(ttl=settings.principal_cache_ttl)
+
+
+def invalidate_principal(user_id: uuid.UUID) -> None:
+    _principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, flush_context) -> None:
+    changed = session.info.setdefault("changed_principals", set())
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WorkspaceMember):
+            changed.add(obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_principals(session: Session) -> None:
+    # After the commit, so a concurrent request can't re-cache the old row
+    for user_id in session.info.pop("changed_principals", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_principals(session: Session) -> None:
+    session.info.pop("changed_principals", None)
+
+
+def _principal_from_user(user: User) -> Principal:
+    return Principal(
+        id=user.id, email=user.email, display_name=user.display_name, is_active=user.is_active
+    )
+
+
+def _decode_access_token(token: str) -> uuid.UUID:
     try:
         payload = jwt.decode(
             token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm]
@@ -43,22 +96,114 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
+    return uuid.UUID(user_id)
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """The full ``User`` row, for endpoints that read private fields or modify the user."""
+    user_id = _decode_access_token(credentials.credentials)
+    result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None or not user.is_active:
+        invalidate_principal(user_id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive",
         )
 
+    _principal_cache.set(user_id, _principal_from_user(user))
     return user
 
 
-def get_storage_backend() -> StorageBackend:
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    """Like ``get_current_user`` but skips the users query while the principal is cached."""
+    user_id = _decode_access_token(credentials.credentials)
+    principal = _principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive",
+        )
+
+    principal = _principal_from_user(user)
+    _principal_cache.set(user_id, principal)
+    return principal
+
+
+# App-wide storage backend, created once and closed in the FastAPI lifespan
+_storage_backend: StorageBackend | None = None
+
+
+def create_storage_backend() -> StorageBackend:
+    backend: StorageBackend
     if settings.storage_backend == "s3":
-        return S3StorageBackend()
-    return LocalStorageBackend(settings.storage_local_path)
+        backend = S3StorageBackend()
+    elif settings.storage_backend == "memory":
+        backend = InMemoryStorageBackend()
+    elif settings.storage_backend == "simulated":
+        # In-memory objects behind S3-like latency, for benchmarks
+        backend = SimulatedLatencyStorageBackend.from_json(
+            InMemoryStorageBackend(), settings.storage_simulated_profile
+        )
+    else:
+        backend = LocalStorageBackend(
+            settings.storage_local_path, fsync=settings.storage_local_fsync
+        )
+    backend.batch_concurrency = settings.storage_batch_concurrency
+
+    if settings.storage_pack_path:
+        # Packed objects live on this host's disk only; over S3 they would never
+        # reach the bucket, so other pods couldn't read them
+        if settings.storage_backend == "s3":
+            raise RuntimeError("STORAGE_PACK_PATH can't be combined with STORAGE_BACKEND=s3")
+        backend = PackfileStorageBackend(
+            backend,
+            path=settings.storage_pack_path,
+            max_object_bytes=settings.storage_pack_max_object_bytes,
+            segment_bytes=settings.storage_pack_segment_bytes,
+            compact_interval=settings.storage_pack_compact_interval,
+        )
+    if settings.storage_compression:
+        backend = CompressingStorageBackend(
+            backend,
+            threshold=settings.storage_compression_threshold,
+            level=settings.storage_compression_level,
+        )
+    # The cache sits outside compression so hits skip decompression
+    if settings.storage_cache_memory_bytes or settings.storage_cache_disk_bytes:
+        backend = CachingStorageBackend(
+            backend,
+            memory_bytes=settings.storage_cache_memory_bytes,
+            max_object_bytes=settings.storage_cache_max_object_bytes,
+            disk_path=settings.storage_cache_disk_path or None,
+            disk_bytes=settings.storage_cache_disk_bytes,
+        )
+    return backend
+
+
+def get_storage_backend() -> StorageBackend:
+    global _storage_backend
+    if _storage_backend is None:
+        _storage_backend = create_storage_backend()
+    return _storage_backend
+
+
+async def close_storage_backend() -> None:
+    global _storage_backend
+    if _storage_backend is not None:
+        await _storage_backend.close()
+        _storage_backend = None
 
 
 def get_storage() -> StorageBackend:
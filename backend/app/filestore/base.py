@@ -1,7 +1,61 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+# Default chunk size for streamed reads and writes (1 MiB)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Default number of concurrent requests in put_many/get_many/delete_many
+BATCH_CONCURRENCY = 16
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a batch operation: values read (get_many) and per-key errors."""
+
+    values: dict[str, bytes | None] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def raise_for_errors(self) -> None:
+        """Re-raise the first error, if any key failed."""
+        if self.errors:
+            key, error = next(iter(self.errors.items()))
+            raise RuntimeError(
+                f"{len(self.errors)} storage operation(s) failed, first on {key!r}"
+            ) from error
+
+
+async def chain_chunks(head: list[bytes], rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Replay already-consumed chunks, then continue with the rest of the stream."""
+    for part in head:
+        yield part
+    async for part in rest:
+        yield part
+
+
+@dataclass
+class ObjectInfo:
+    size: int
+    # Hex SHA-256 of the content when the backend tracks it, else None
+    sha256: str | None = None
+
+
+def upload_matches(info: ObjectInfo | None, size: int, sha256: str) -> bool:
+    """Whether a direct upload exists with the announced size and a recorded SHA-256."""
+    return info is not None and info.size == size and info.sha256 == sha256.lower()
 
 
 class StorageBackend(ABC):
+    # Requests in flight for the batch operations; set from settings by the factory
+    batch_concurrency: int = BATCH_CONCURRENCY
+
     @abstractmethod
     async def put(self, key: str, data: bytes) -> None:
         ...
@@ -17,3 +71,137 @@ class StorageBackend(ABC):
     @abstractmethod
     async def exists(self, key: str) -> bool:
         ...
+
+    async def close(self) -> None:
+        """Release pooled connections or other resources held by the backend."""
+
+    def stats(self) -> dict[str, int]:
+        """Counters describing the backend (cache hits, hedged requests, ...)."""
+        return {}
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Store an object from an async iterator of chunks. Returns bytes written.
+
+        The default implementation buffers the whole stream; backends that can
+        write incrementally override this to keep memory bounded.
+        """
+        parts = [chunk async for chunk in chunks]
+        data = b"".join(parts)
+        await self.put(key, data)
+        return len(data)
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        """Return an async iterator over the object's bytes, or None if missing.
+
+        ``offset``/``length`` restrict the stream to a byte range; a range
+        running past the end of the object is truncated.
+        """
+        data = await self.get(key)
+        if data is None:
+            return None
+        end = len(data) if length is None else min(offset + length, len(data))
+
+        async def _iter() -> AsyncIterator[bytes]:
+            for start in range(offset, end, chunk_size):
+                yield data[start:min(start + chunk_size, end)]
+
+        return _iter()
+
+    async def get_range(self, key: str, offset: int, length: int) -> bytes | None:
+        """Read ``length`` bytes starting at ``offset``, or None if the object is missing."""
+        stream = await self.get_stream(key, offset=offset, length=length)
+        if stream is None:
+            return None
+        return b"".join([chunk async for chunk in stream])
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        """Size (and checksum, if known) of an object, or None if it's missing."""
+        data = await self.get(key)
+        if data is None:
+            return None
+        return ObjectInfo(size=len(data))
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]] | None:
+        """URL and required headers for uploading an object directly, bypassing the API.
+
+        None when the backend can't issue presigned URLs.
+        """
+        return None
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        """Move a direct upload to ``key`` if it has the announced size and SHA-256.
+
+        Only a checksum the backend recorded at upload time is trusted; the
+        presigned URL signs it, so the upload can't later be replaced with
+        different content. Objects are never read back to hash them. Returns
+        False, moving nothing, when the upload is missing or doesn't match.
+        """
+        if not upload_matches(await self.head(upload_key), size, sha256):
+            return False
+        stream = await self.get_stream(upload_key)
+        if stream is None:
+            return False
+        await self.put_stream(key, stream)
+        await self.delete(upload_key)
+        return True
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str | None:
+        """URL for downloading an object directly, or None if unsupported."""
+        return None
+
+    async def local_path(self, key: str) -> Path | None:
+        """Path of a file holding exactly the object's bytes, if the backend has one.
+
+        Lets the API hand the file to the server (``FileResponse``) instead of
+        streaming it through Python. None when the object isn't a plain local file.
+        """
+        return None
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        """Yield ``(key, last_modified)`` for every stored object under ``prefix``."""
+        raise NotImplementedError(f"{type(self).__name__} does not support listing keys")
+        yield
+
+    async def _run_batch(
+        self,
+        keys: Iterable[str],
+        op: Callable[[str], Awaitable[bytes | None]],
+        result: BatchResult,
+        keep_values: bool = False,
+    ) -> BatchResult:
+        slots = asyncio.Semaphore(self.batch_concurrency)
+
+        async def _one(key: str) -> None:
+            async with slots:
+                try:
+                    value = await op(key)
+                except Exception as e:
+                    result.errors[key] = e
+                    return
+            if keep_values:
+                result.values[key] = value
+
+        await asyncio.gather(*(_one(key) for key in keys))
+        return result
+
+    async def put_many(self, items: Mapping[str, bytes]) -> BatchResult:
+        """Store several objects concurrently. Failures are reported per key."""
+        return await self._run_batch(items, lambda key: self.put(key, items[key]), BatchResult())
+
+    async def get_many(self, keys: Iterable[str]) -> BatchResult:
+        """Read several objects concurrently into ``values`` (None for missing keys)."""
+        return await self._run_batch(keys, self.get, BatchResult(), keep_values=True)
+
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        """Delete several objects. Failures are reported per key."""
+        return await self._run_batch(keys, self.delete, BatchResult())
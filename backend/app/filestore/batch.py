@@ -0,0 +1,112 @@
+from collections.abc import AsyncIterator, Iterable, Mapping
+from datetime import datetime
+from pathlib import Path
+
+from app.filestore.base import BatchResult, ObjectInfo, StorageBackend
+
+
+class WriteBatch(StorageBackend):
+    """Collects ``put`` calls and writes them with a single ``put_many``.
+
+    Pass it as the storage to service code that creates many objects in a loop
+    (folder templates, default instances), then flush it before committing::
+
+        async with WriteBatch(storage) as batch:
+            await create_lots_of_files(db, batch, ...)
+
+    Reads see pending writes. The context manager flushes on a clean exit and
+    drops pending writes when the block raises.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+        self._pending: dict[str, bytes] = {}
+
+    async def __aenter__(self) -> "WriteBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.flush()
+        else:
+            self._pending.clear()
+
+    async def flush(self) -> None:
+        """Write pending objects; raises if any of them failed."""
+        if not self._pending:
+            return
+        items, self._pending = self._pending, {}
+        result = await self.backend.put_many(items)
+        result.raise_for_errors()
+
+    async def put(self, key: str, data: bytes) -> None:
+        self._pending[key] = data
+
+    async def put_many(self, items: Mapping[str, bytes]) -> BatchResult:
+        self._pending.update(items)
+        return BatchResult()
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        self._pending.pop(key, None)
+        return await self.backend.put_stream(key, chunks)
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._pending:
+            return self._pending[key]
+        return await self.backend.get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> BatchResult:
+        keys = list(keys)
+        result = await self.backend.get_many([k for k in keys if k not in self._pending])
+        result.values.update({k: self._pending[k] for k in keys if k in self._pending})
+        return result
+
+    async def get_stream(self, key: str, *args, **kwargs) -> AsyncIterator[bytes] | None:
+        if key in self._pending:
+            return await super().get_stream(key, *args, **kwargs)
+        return await self.backend.get_stream(key, *args, **kwargs)
+
+    async def delete(self, key: str) -> None:
+        self._pending.pop(key, None)
+        await self.backend.delete(key)
+
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        keys = list(keys)
+        for key in keys:
+            self._pending.pop(key, None)
+        return await self.backend.delete_many(keys)
+
+    async def exists(self, key: str) -> bool:
+        return key in self._pending or await self.backend.exists(key)
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        if key in self._pending:
+            return ObjectInfo(size=len(self._pending[key]))
+        return await self.backend.head(key)
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]] | None:
+        return await self.backend.presigned_put_url(key, expires_in, sha256)
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        return await self.backend.accept_upload(upload_key, key, size, sha256)
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str | None:
+        if key in self._pending:
+            return None
+        return await self.backend.presigned_get_url(key, expires_in, filename)
+
+    async def local_path(self, key: str) -> Path | None:
+        if key in self._pending:
+            return None
+        return await self.backend.local_path(key)
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        async for entry in self.backend.list_keys(prefix):
+            yield entry
+
+    def stats(self) -> dict[str, int]:
+        return self.backend.stats()
@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable, Mapping
+from datetime import datetime
+from pathlib import Path
+
+import aiofiles
+
+from app.filestore.base import STREAM_CHUNK_SIZE, BatchResult, ObjectInfo, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+class CachingStorageBackend(StorageBackend):
+    """Read-through cache in front of another storage backend.
+
+    Reads are served from a byte-bounded in-memory LRU, then from an optional
+    local-disk tier with size-based eviction, before falling back to the
+    wrapped backend. ``put`` and ``delete`` invalidate both tiers.
+
+    Invalidation is per process. That is safe here because storage keys are
+    never rewritten with different bytes (content-addressed or per-upload keys).
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        memory_bytes: int,
+        max_object_bytes: int,
+        disk_path: str | None = None,
+        disk_bytes: int = 0,
+    ):
+        self.backend = backend
+        self.memory_bytes = memory_bytes
+        self.max_object_bytes = max_object_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used = 0
+
+        self.disk_bytes = disk_bytes if disk_path else 0
+        self.disk_path = Path(disk_path) if disk_path else None
+        # file name -> size, least recently used first
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_used = 0
+        if self.disk_path is not None:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+        self._counters = {
+            "cache_memory_hits": 0,
+            "cache_disk_hits": 0,
+            "cache_misses": 0,
+        }
+
+    def _load_disk_index(self) -> None:
+        """Pick up objects cached by a previous process, oldest first."""
+        entries = []
+        for entry in os.scandir(self.disk_path):
+            if entry.name.endswith(".tmp"):
+                # Left behind by a fill interrupted by a crash
+                _remove_if_exists(Path(entry.path))
+            elif entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_used += size
+
+    @staticmethod
+    def _disk_name(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    # ── Memory tier ────────────────────────────────────
+
+    def _memory_get(self, key: str) -> bytes | None:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+        return data
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_object_bytes or len(data) > self.memory_bytes:
+            return
+        self._memory_discard(key)
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _memory_discard(self, key: str) -> None:
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._memory_used -= len(data)
+
+    # ── Disk tier ──────────────────────────────────────
+
+    async def _disk_get(self, key: str) -> bytes | None:
+        if self.disk_path is None:
+            return None
+        name = self._disk_name(key)
+        if name not in self._disk:
+            return None
+        try:
+            async with aiofiles.open(self.disk_path / name, "rb") as f:
+                data = await f.read()
+        except FileNotFoundError:
+            self._disk_used -= self._disk.pop(name, 0)
+            return None
+        self._disk.move_to_end(name)
+        return data
+
+    async def _disk_put(self, key: str, data: bytes) -> None:
+        if self.disk_path is None or len(data) > self.disk_bytes:
+            return
+        name = self._disk_name(key)
+        await self._disk_discard(key)
+        # Concurrent misses on one key each fill through their own temp file
+        tmp_path = self.disk_path / f"{name}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(data)
+            await asyncio.to_thread(os.replace, tmp_path, self.disk_path / name)
+        except BaseException:
+            await asyncio.to_thread(_remove_if_exists, tmp_path)
+            raise
+        # Another fill of the same key may have landed while this one was writing
+        self._disk_used -= self._disk.pop(name, 0)
+        self._disk[name] = len(data)
+        self._disk_used += len(data)
+        while self._disk_used > self.disk_bytes:
+            evicted, size = self._disk.popitem(last=False)
+            self._disk_used -= size
+            await asyncio.to_thread(_remove_if_exists, self.disk_path / evicted)
+
+    async def _disk_discard(self, key: str) -> None:
+        if self.disk_path is None:
+            return
+        name = self._disk_name(key)
+        if name in self._disk:
+            self._disk_used -= self._disk.pop(name)
+            await asyncio.to_thread(_remove_if_exists, self.disk_path / name)
+
+    async def _cached(self, key: str) -> bytes | None:
+        data = self._memory_get(key)
+        if data is not None:
+            self._counters["cache_memory_hits"] += 1
+            return data
+        data = await self._disk_get(key)
+        if data is not None:
+            self._counters["cache_disk_hits"] += 1
+            self._memory_put(key, data)
+            return data
+        return None
+
+    async def _fill(self, key: str, data: bytes) -> None:
+        """Cache a fetched object. Best effort: a failed disk write only logs."""
+        self._memory_put(key, data)
+        try:
+            await self._disk_put(key, data)
+        except OSError:
+            logger.warning("Failed to write %s to the disk cache", key, exc_info=True)
+
+    async def _invalidate(self, key: str) -> None:
+        self._memory_discard(key)
+        await self._disk_discard(key)
+
+    # ── StorageBackend ─────────────────────────────────
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._invalidate(key)
+        await self.backend.put(key, data)
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        await self._invalidate(key)
+        return await self.backend.put_stream(key, chunks)
+
+    async def get(self, key: str) -> bytes | None:
+        data = await self._cached(key)
+        if data is not None:
+            return data
+        self._counters["cache_misses"] += 1
+        data = await self.backend.get(key)
+        if data is not None:
+            await self._fill(key, data)
+        return data
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        # Streams are used for large downloads; serve them from cache when
+        # present but don't pull whole objects into the cache for them.
+        data = await self._cached(key)
+        if data is None:
+            self._counters["cache_misses"] += 1
+            return await self.backend.get_stream(key, chunk_size, offset, length)
+        end = len(data) if length is None else min(offset + length, len(data))
+
+        async def _iter() -> AsyncIterator[bytes]:
+            for start in range(offset, end, chunk_size):
+                yield data[start:min(start + chunk_size, end)]
+
+        return _iter()
+
+    async def delete(self, key: str) -> None:
+        await self._invalidate(key)
+        await self.backend.delete(key)
+
+    async def put_many(self, items: Mapping[str, bytes]) -> BatchResult:
+        for key in items:
+            await self._invalidate(key)
+        return await self.backend.put_many(items)
+
+    async def get_many(self, keys: Iterable[str]) -> BatchResult:
+        result = BatchResult()
+        misses = []
+        for key in keys:
+            data = await self._cached(key)
+            if data is None:
+                misses.append(key)
+            else:
+                result.values[key] = data
+        if misses:
+            self._counters["cache_misses"] += len(misses)
+            fetched = await self.backend.get_many(misses)
+            for key, data in fetched.values.items():
+                if data is not None:
+                    await self._fill(key, data)
+            result.values.update(fetched.values)
+            result.errors.update(fetched.errors)
+        return result
+
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        keys = list(keys)
+        for key in keys:
+            await self._invalidate(key)
+        return await self.backend.delete_many(keys)
+
+    async def exists(self, key: str) -> bool:
+        if key in self._memory:
+            return True
+        return await self.backend.exists(key)
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        return await self.backend.head(key)
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]] | None:
+        # Presigned uploads go to fresh keys, so there is nothing to invalidate
+        return await self.backend.presigned_put_url(key, expires_in, sha256)
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        return await self.backend.accept_upload(upload_key, key, size, sha256)
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str | None:
+        return await self.backend.presigned_get_url(key, expires_in, filename)
+
+    async def local_path(self, key: str) -> Path | None:
+        return await self.backend.local_path(key)
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        async for entry in self.backend.list_keys(prefix):
+            yield entry
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self.backend.stats(),
+            **self._counters,
+            "cache_memory_bytes": self._memory_used,
+            "cache_memory_objects": len(self._memory),
+            "cache_disk_bytes": self._disk_used,
+            "cache_disk_objects": len(self._disk),
+        }
+
+
+def _remove_if_exists(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,281 @@
+import asyncio
+import zlib
+from collections.abc import AsyncIterator, Iterable, Mapping
+from datetime import datetime
+from pathlib import Path
+
+from app.filestore.base import (
+    STREAM_CHUNK_SIZE,
+    BatchResult,
+    ObjectInfo,
+    StorageBackend,
+    chain_chunks,
+)
+
+# Objects written by this wrapper start with MAGIC followed by a codec byte.
+# Anything else (including everything stored before compression was enabled)
+# is read back as-is.
+MAGIC = b"\x00PZC"
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+HEADER_SIZE = len(MAGIC) + 1
+
+# Compress/decompress larger payloads off the event loop
+_THREAD_THRESHOLD = 256 * 1024
+
+
+def _header(codec: int) -> bytes:
+    return MAGIC + bytes([codec])
+
+
+def _codec(head: bytes) -> int | None:
+    """Codec named by an object's first bytes, or None for a legacy raw object."""
+    if len(head) < HEADER_SIZE or not head.startswith(MAGIC):
+        return None
+    return head[len(MAGIC)]
+
+
+class CompressingStorageBackend(StorageBackend):
+    """Compresses objects with zlib before handing them to another backend.
+
+    Objects smaller than ``threshold``, and objects that don't shrink, are
+    stored raw. Reads detect the header, so raw and legacy objects written
+    before compression was enabled keep working. Byte ranges always refer
+    to the uncompressed content.
+    """
+
+    def __init__(self, backend: StorageBackend, threshold: int, level: int = 6):
+        self.backend = backend
+        self.threshold = threshold
+        self.level = level
+        self._counters = {
+            "compression_objects_compressed": 0,
+            "compression_objects_raw": 0,
+            "compression_bytes_in": 0,
+            "compression_bytes_out": 0,
+        }
+
+    async def _compress(self, data: bytes) -> bytes:
+        if len(data) >= _THREAD_THRESHOLD:
+            return await asyncio.to_thread(zlib.compress, data, self.level)
+        return zlib.compress(data, self.level)
+
+    def _encode_raw(self, data: bytes) -> bytes:
+        self._counters["compression_objects_raw"] += 1
+        # Raw data that happens to look like a header needs an explicit one
+        if data.startswith(MAGIC):
+            return _header(CODEC_RAW) + data
+        return data
+
+    async def _encode(self, data: bytes) -> bytes:
+        if len(data) < self.threshold:
+            return self._encode_raw(data)
+        compressed = await self._compress(data)
+        if len(compressed) + HEADER_SIZE >= len(data):
+            return self._encode_raw(data)
+        self._counters["compression_objects_compressed"] += 1
+        self._counters["compression_bytes_in"] += len(data)
+        self._counters["compression_bytes_out"] += len(compressed) + HEADER_SIZE
+        return _header(CODEC_ZLIB) + compressed
+
+    @staticmethod
+    async def _decode(stored: bytes) -> bytes:
+        codec = _codec(stored)
+        if codec is None:
+            return stored
+        body = stored[HEADER_SIZE:]
+        if codec == CODEC_RAW:
+            return body
+        if len(body) >= _THREAD_THRESHOLD:
+            return await asyncio.to_thread(zlib.decompress, body)
+        return zlib.decompress(body)
+
+    # ── StorageBackend ─────────────────────────────────
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self.backend.put(key, await self._encode(data))
+
+    async def get(self, key: str) -> bytes | None:
+        stored = await self.backend.get(key)
+        if stored is None:
+            return None
+        return await self._decode(stored)
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        # Buffer up to the threshold to decide between raw and compressed
+        head: list[bytes] = []
+        buffered = 0
+        async for chunk in chunks:
+            head.append(chunk)
+            buffered += len(chunk)
+            if buffered >= self.threshold:
+                break
+        else:
+            data = b"".join(head)
+            await self.backend.put(key, self._encode_raw(data))
+            return len(data)
+
+        written = 0
+        compressor = zlib.compressobj(self.level)
+
+        async def _compressed() -> AsyncIterator[bytes]:
+            nonlocal written
+            yield _header(CODEC_ZLIB)
+            async for chunk in chain_chunks(head, chunks):
+                written += len(chunk)
+                out = compressor.compress(chunk)
+                if out:
+                    yield out
+            yield compressor.flush()
+
+        stored = await self.backend.put_stream(key, _compressed())
+        self._counters["compression_objects_compressed"] += 1
+        self._counters["compression_bytes_in"] += written
+        self._counters["compression_bytes_out"] += stored
+        return written
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        if offset or length is not None:
+            # Check the header first so raw objects keep their cheap ranged reads
+            head = await self.backend.get_range(key, 0, HEADER_SIZE)
+            if head is None:
+                return None
+            codec = _codec(head)
+            if codec is None:
+                return await self.backend.get_stream(key, chunk_size, offset, length)
+            if codec == CODEC_RAW:
+                return await self.backend.get_stream(
+                    key, chunk_size, offset + HEADER_SIZE, length
+                )
+
+        stored = await self.backend.get_stream(key, chunk_size)
+        if stored is None:
+            return None
+        return _decode_stream(stored, chunk_size, offset, length)
+
+    async def put_many(self, items: Mapping[str, bytes]) -> BatchResult:
+        encoded = {key: await self._encode(data) for key, data in items.items()}
+        return await self.backend.put_many(encoded)
+
+    async def get_many(self, keys: Iterable[str]) -> BatchResult:
+        result = await self.backend.get_many(keys)
+        for key, stored in result.values.items():
+            if stored is None:
+                continue
+            try:
+                result.values[key] = await self._decode(stored)
+            except zlib.error as e:
+                result.errors[key] = e
+                result.values[key] = None
+        return result
+
+    async def delete(self, key: str) -> None:
+        await self.backend.delete(key)
+
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        return await self.backend.delete_many(keys)
+
+    async def exists(self, key: str) -> bool:
+        return await self.backend.exists(key)
+
+    async def _is_plain(self, key: str) -> bool:
+        """Whether the stored object is the content itself, with no header."""
+        head = await self.backend.get_range(key, 0, HEADER_SIZE)
+        return head is not None and _codec(head) is None
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        if await self._is_plain(key):
+            return await self.backend.head(key)
+        return await super().head(key)
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]] | None:
+        # Direct uploads are stored without a header; see accept_upload
+        return await self.backend.presigned_put_url(key, expires_in, sha256)
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        if not await self.backend.accept_upload(upload_key, key, size, sha256):
+            return False
+        # A raw upload that happens to start with MAGIC would be decoded on
+        # read, so it gets an explicit raw header like put() would give it
+        head = await self.backend.get_range(key, 0, HEADER_SIZE)
+        if head is not None and _codec(head) is not None:
+            stored = await self.backend.get_stream(key)
+            await self.backend.put_stream(key, chain_chunks([_header(CODEC_RAW)], stored))
+        return True
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str | None:
+        # Only objects stored without a header can be served as-is
+        if not await self._is_plain(key):
+            return None
+        return await self.backend.presigned_get_url(key, expires_in, filename)
+
+    async def local_path(self, key: str) -> Path | None:
+        path = await self.backend.local_path(key)
+        if path is None or not await self._is_plain(key):
+            return None
+        return path
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        async for entry in self.backend.list_keys(prefix):
+            yield entry
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {**self.backend.stats(), **self._counters}
+
+
+async def _decode_stream(
+    stored: AsyncIterator[bytes],
+    chunk_size: int,
+    offset: int,
+    length: int | None,
+) -> AsyncIterator[bytes]:
+    """Strip the header from a stored stream, inflate it and cut out a byte range."""
+    head = b""
+    async for chunk in stored:
+        head += chunk
+        if len(head) >= HEADER_SIZE:
+            break
+    codec = _codec(head)
+    body = head if codec is None else head[HEADER_SIZE:]
+    decompressor = zlib.decompressobj() if codec == CODEC_ZLIB else None
+
+    async def _plain() -> AsyncIterator[bytes]:
+        if decompressor is None:
+            yield body
+            async for piece in stored:
+                yield piece
+            return
+        yield decompressor.decompress(body)
+        async for piece in stored:
+            yield decompressor.decompress(piece)
+        yield decompressor.flush()
+
+    skip = offset
+    remaining = length
+    async for data in _plain():
+        if skip:
+            if len(data) <= skip:
+                skip -= len(data)
+                continue
+            data = data[skip:]
+            skip = 0
+        if remaining is not None:
+            data = data[:remaining]
+            remaining -= len(data)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        if remaining == 0:
+            break
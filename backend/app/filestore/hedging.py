@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Most hedge tokens that can be saved up, i.e. the largest burst of hedges
+_MAX_TOKENS = 10.0
+# Recompute the delay percentile after this many new samples
+_RECOMPUTE_EVERY = 32
+
+
+class HedgingPolicy:
+    """Sends a second copy of a slow request and takes whichever answers first.
+
+    The hedge delay is the ``percentile`` of recently observed latencies, so
+    only the slowest requests get hedged. Every request earns ``max_rate``
+    tokens and every hedge spends one, which caps hedges at that fraction of
+    requests even when the backend slows down as a whole.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_rate: float = 0.05,
+        initial_delay: float = 0.05,
+        window: int = 512,
+    ):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self._delay = initial_delay
+        self._samples: deque[float] = deque(maxlen=window)
+        self._since_recompute = 0
+        self._tokens = _MAX_TOKENS
+        self._counters = {
+            "hedge_requests": 0,
+            "hedges_fired": 0,
+            "hedges_won": 0,
+            "hedges_throttled": 0,
+        }
+
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    def _record(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._since_recompute += 1
+        if self._since_recompute >= _RECOMPUTE_EVERY:
+            self._since_recompute = 0
+            ordered = sorted(self._samples)
+            self._delay = ordered[min(int(len(ordered) * self.percentile), len(ordered) - 1)]
+
+    def _take_token(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Run ``request``, hedging it with a second call if it is slow."""
+        self._counters["hedge_requests"] += 1
+        self._tokens = min(self._tokens + self.max_rate, _MAX_TOKENS)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(request())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._delay)
+            if done or not self._take_token():
+                if not done:
+                    self._counters["hedges_throttled"] += 1
+                result = await primary
+                self._record(time.monotonic() - started)
+                return result
+
+            self._counters["hedges_fired"] += 1
+            hedge_started = time.monotonic()
+            hedge = asyncio.ensure_future(request())
+            tasks.add(hedge)
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the primary when both finish in the same iteration
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is hedge:
+                        self._counters["hedges_won"] += 1
+                        self._record(time.monotonic() - hedge_started)
+                    else:
+                        self._record(time.monotonic() - started)
+                    return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict[str, int]:
+        return {**self._counters, "hedge_delay_ms": int(self._delay * 1000)}
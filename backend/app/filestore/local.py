@@ -1,36 +1,201 @@
+import asyncio
+import hashlib
+import mmap
 import os
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
 from pathlib import Path
 
 import aiofiles
 
-from app.filestore.base import StorageBackend
+from app.filestore.base import STREAM_CHUNK_SIZE, ObjectInfo, StorageBackend
+
+# Objects live under objects/<2 hex>/<2 hex>/<key>, sharded by the key's hash.
+# Files written before sharding sit at <base>/<key> and are still read; their
+# keys all started with the workspace id (<workspace_uuid>/...).
+OBJECTS_DIR = "objects"
+TMP_DIR = "tmp"
 
 
 class LocalStorageBackend(StorageBackend):
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, fsync: bool = False):
         self.base_path = Path(base_path)
-        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.objects_path = self.base_path / OBJECTS_DIR
+        self.tmp_path = self.base_path / TMP_DIR
+        self.fsync = fsync
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        self.tmp_path.mkdir(parents=True, exist_ok=True)
 
     def _resolve(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.objects_path / digest[:2] / digest[2:4] / key
+
+    def _legacy(self, key: str) -> Path:
         return self.base_path / key
 
-    async def put(self, key: str, data: bytes) -> None:
+    def _find(self, key: str) -> Path | None:
+        """Where the object is stored, checking the legacy flat layout too. Blocking."""
+        for path in (self._resolve(key), self._legacy(key)):
+            if path.is_file():
+                return path
+        return None
+
+    async def _locate(self, key: str) -> Path | None:
+        return await asyncio.to_thread(self._find, key)
+
+    def _commit(self, tmp: Path, key: str) -> None:
+        """Move a finished temp file into place. Blocking."""
         path = self._resolve(key)
         path.parent.mkdir(parents=True, exist_ok=True)
-        async with aiofiles.open(path, "wb") as f:
-            await f.write(data)
+        os.replace(tmp, path)
+        if self.fsync:
+            fd = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        # A newer copy supersedes one in the legacy layout
+        _remove_if_exists(self._legacy(key))
+
+    async def _write(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Write to a temp file and rename it into place, so readers never see a torn file."""
+        tmp = self.tmp_path / f"{uuid.uuid4().hex}.tmp"
+        written = 0
+        try:
+            async with aiofiles.open(tmp, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    written += len(chunk)
+                if self.fsync:
+                    await f.flush()
+                    await asyncio.to_thread(os.fsync, f.fileno())
+            await asyncio.to_thread(self._commit, tmp, key)
+        except BaseException:
+            await asyncio.to_thread(_remove_if_exists, tmp)
+            raise
+        return written
+
+    async def put(self, key: str, data: bytes) -> None:
+        async def _single() -> AsyncIterator[bytes]:
+            yield data
+
+        await self._write(key, _single())
 
     async def get(self, key: str) -> bytes | None:
-        path = self._resolve(key)
-        if not path.exists():
+        path = await self._locate(key)
+        if path is None:
             return None
         async with aiofiles.open(path, "rb") as f:
             return await f.read()
 
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        return await self._write(key, chunks)
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        path = await self._locate(key)
+        if path is None:
+            return None
+
+        async def _iter() -> AsyncIterator[bytes]:
+            remaining = length
+            async with aiofiles.open(path, "rb") as f:
+                if offset:
+                    await f.seek(offset)
+                while remaining is None or remaining > 0:
+                    size = chunk_size if remaining is None else min(chunk_size, remaining)
+                    chunk = await f.read(size)
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+
+        return _iter()
+
+    async def get_range(self, key: str, offset: int, length: int) -> bytes | None:
+        path = await self._locate(key)
+        if path is None:
+            return None
+        return await asyncio.to_thread(_read_mapped, path, offset, length)
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        path = await self._locate(key)
+        if path is None:
+            return None
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(size=stat.st_size)
+
+    async def local_path(self, key: str) -> Path | None:
+        return await self._locate(key)
+
     async def delete(self, key: str) -> None:
-        path = self._resolve(key)
-        if path.exists():
-            os.remove(path)
+        await asyncio.to_thread(self._delete, key)
+
+    def _delete(self, key: str) -> None:
+        _remove_if_exists(self._resolve(key))
+        _remove_if_exists(self._legacy(key))
 
     async def exists(self, key: str) -> bool:
-        return self._resolve(key).exists()
+        return await self._locate(key) is not None
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        for key, mtime in await asyncio.to_thread(self._scan, prefix):
+            yield key, datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+    def _scan(self, prefix: str) -> list[tuple[str, float]]:
+        """Keys under objects/ and the legacy workspace directories. Blocking.
+
+        Anything else under the base path (temp files, or a pack or cache
+        directory configured inside it) isn't an object and must never be
+        offered to the garbage collector.
+        """
+        entries = []
+        for root, dirs, names in os.walk(self.base_path):
+            if Path(root) == self.base_path:
+                dirs[:] = [d for d in dirs if d == OBJECTS_DIR or _is_uuid(d)]
+                continue
+            rel = Path(root).relative_to(self.base_path).parts
+            for name in names:
+                if rel[:1] == (OBJECTS_DIR,):
+                    # Strip objects/<shard>/<shard>/
+                    key = "/".join((*rel[3:], name))
+                else:
+                    key = "/".join((*rel, name))
+                if key.startswith(prefix):
+                    entries.append((key, (Path(root) / name).stat().st_mtime))
+        return entries
+
+
+def _is_uuid(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _remove_if_exists(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_mapped(path: Path, offset: int, length: int) -> bytes:
+    """Copy one byte range out of a memory-mapped file, without reading the rest."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset >= size or length <= 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[offset:offset + length]
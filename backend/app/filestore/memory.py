@@ -0,0 +1,45 @@
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+
+from app.filestore.base import ObjectInfo, StorageBackend
+
+
+class InMemoryStorageBackend(StorageBackend):
+    """Keeps objects in a dict. For tests and benchmarks; nothing survives a restart."""
+
+    def __init__(self):
+        self._objects: dict[str, tuple[bytes, datetime]] = {}
+
+    async def put(self, key: str, data: bytes) -> None:
+        self._objects[key] = (bytes(data), datetime.now(timezone.utc))
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._objects.get(key)
+        return entry[0] if entry is not None else None
+
+    async def get_range(self, key: str, offset: int, length: int) -> bytes | None:
+        data = await self.get(key)
+        if data is None:
+            return None
+        return data[offset:offset + length]
+
+    async def delete(self, key: str) -> None:
+        self._objects.pop(key, None)
+
+    async def exists(self, key: str) -> bool:
+        return key in self._objects
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        data = await self.get(key)
+        return ObjectInfo(size=len(data)) if data is not None else None
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        for key, (_, modified) in list(self._objects.items()):
+            if key.startswith(prefix):
+                yield key, modified
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_objects": len(self._objects),
+            "memory_bytes": sum(len(data) for data, _ in self._objects.values()),
+        }
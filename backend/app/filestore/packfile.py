@@ -0,0 +1,408 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from collections.abc import AsyncIterator, Iterable, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.filestore.base import STREAM_CHUNK_SIZE, BatchResult, ObjectInfo, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Sealed segments with less than this fraction of live bytes get compacted
+COMPACT_LIVE_RATIO = 0.5
+
+
+@dataclass
+class PackEntry:
+    segment: int
+    offset: int
+    length: int
+    modified: float
+
+
+class PackfileStorageBackend(StorageBackend):
+    """Packs small objects into append-only segment files on local disk.
+
+    Objects smaller than ``max_object_bytes`` are appended to the current
+    segment under ``path/segments`` and located through an in-memory index
+    built from the append-only ``path/index.log``. Larger objects go to the
+    wrapped backend. Deletes only write a tombstone; a background task
+    rewrites segments that are mostly dead and trims the index log.
+
+    Several processes on one host (uvicorn workers, the GC command) can share
+    a pack directory. Writes and compaction hold an exclusive ``flock`` on
+    ``path/LOCK``; every operation first applies the index records other
+    processes appended since it last looked, and reloads the index when
+    compaction has rewritten the log. Packed objects never reach the wrapped
+    backend, so only stack this on storage local to the host.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        path: str,
+        max_object_bytes: int,
+        segment_bytes: int,
+        compact_interval: float = 300,
+    ):
+        self.backend = backend
+        self.path = Path(path)
+        self.segments_path = self.path / "segments"
+        self.segments_path.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.path / "index.log"
+        self.max_object_bytes = max_object_bytes
+        self.segment_bytes = segment_bytes
+        self.compact_interval = compact_interval
+
+        self._index: dict[str, PackEntry] = {}
+        # Live and total bytes per segment, for picking compaction candidates
+        self._live: dict[int, int] = {}
+        self._size: dict[int, int] = {}
+        self._index_records = 0
+        # How far index.log has been applied, and which file that was
+        self._index_pos = 0
+        self._index_inode: int | None = None
+        self._lock = asyncio.Lock()
+        self._lock_file = open(self.path / "LOCK", "a")
+        self._compactor: asyncio.Task | None = None
+        self._counters = {"pack_compactions": 0}
+
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._truncate_torn_record()
+            self._reset()
+            self._refresh()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ── Index ──────────────────────────────────────────
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.segments_path / f"{segment:08d}.pack"
+
+    @property
+    def _current(self) -> int:
+        """The segment new objects are appended to (the newest one)."""
+        return max(self._size, default=0)
+
+    def _truncate_torn_record(self) -> None:
+        """Drop a torn last line left by a crash mid-append. Caller holds the file lock."""
+        try:
+            with open(self.index_path, "rb+") as f:
+                content = f.read()
+                end = content.rfind(b"\n") + 1
+                if end < len(content):
+                    f.truncate(end)
+        except FileNotFoundError:
+            pass
+
+    def _reset(self) -> None:
+        self._index.clear()
+        self._live.clear()
+        self._size.clear()
+        self._index_records = 0
+        self._index_pos = 0
+        for entry in os.scandir(self.segments_path):
+            if entry.name.endswith(".pack"):
+                segment = int(entry.name.removesuffix(".pack"))
+                self._size[segment] = entry.stat().st_size
+                self._live[segment] = 0
+
+    def _refresh(self) -> None:
+        """Apply index records appended since the last call, by any process.
+
+        Cheap when nothing changed (one ``stat``). Runs on the event loop
+        thread so the index is never modified concurrently.
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._index_inode and stat.st_size == self._index_pos:
+            return
+        try:
+            f = open(self.index_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._index_inode:
+                # First load, or compaction rewrote the log: rebuild from scratch
+                self._reset()
+                self._index_inode = inode
+            f.seek(self._index_pos)
+            content = f.read()
+        # A line still being appended is picked up next time
+        end = content.rfind(b"\n") + 1
+        for line in content[:end].splitlines():
+            self._apply(json.loads(line))
+            self._index_records += 1
+        self._index_pos += end
+
+    def _apply(self, record: dict) -> None:
+        old = self._index.pop(record["k"], None)
+        if old is not None and old.segment in self._live:
+            self._live[old.segment] -= old.length
+        if "s" in record:
+            entry = PackEntry(record["s"], record["o"], record["n"], record["t"])
+            self._index[record["k"]] = entry
+            self._live[entry.segment] = self._live.get(entry.segment, 0) + entry.length
+            self._size[entry.segment] = max(
+                self._size.get(entry.segment, 0), entry.offset + entry.length
+            )
+
+    @asynccontextmanager
+    async def _locked(self):
+        """Exclusive access to the pack directory, across processes, with a fresh index."""
+        async with self._lock:
+            await asyncio.to_thread(fcntl.flock, self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _entry(self, key: str) -> PackEntry | None:
+        self._refresh()
+        return self._index.get(key)
+
+    def _append_index(self, records: list[dict]) -> None:
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _append_segment(self, segment: int, data: bytes) -> int:
+        with open(self._segment_path(segment), "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        return offset
+
+    async def _write_packed(self, items: Mapping[str, bytes]) -> None:
+        """Append objects to the current segment and record them. Caller holds the lock."""
+        records = []
+        now = datetime.now(timezone.utc).timestamp()
+        segment = self._current
+        for key, data in items.items():
+            if self._size.get(segment, 0) >= self.segment_bytes:
+                segment += 1
+            offset = await asyncio.to_thread(self._append_segment, segment, data)
+            self._size[segment] = offset + len(data)
+            self._live.setdefault(segment, 0)
+            records.append({"k": key, "s": segment, "o": offset, "n": len(data), "t": now})
+        await asyncio.to_thread(self._append_index, records)
+        self._refresh()
+
+    async def _forget(self, keys: Iterable[str]) -> None:
+        """Tombstone packed keys. Caller holds the lock."""
+        records = [{"k": key} for key in keys if key in self._index]
+        if not records:
+            return
+        await asyncio.to_thread(self._append_index, records)
+        self._refresh()
+
+    def _read(self, entry: PackEntry, offset: int = 0, length: int | None = None) -> bytes:
+        start = min(offset, entry.length)
+        end = entry.length if length is None else min(start + length, entry.length)
+        fd = os.open(self._segment_path(entry.segment), os.O_RDONLY)
+        try:
+            return os.pread(fd, end - start, entry.offset + start)
+        finally:
+            os.close(fd)
+
+    async def _read_packed(
+        self, key: str, offset: int = 0, length: int | None = None
+    ) -> bytes | None:
+        # Compaction may move the entry between the lookup and the read; retry once
+        for _ in range(2):
+            entry = self._entry(key)
+            if entry is None:
+                return None
+            try:
+                return await asyncio.to_thread(self._read, entry, offset, length)
+            except FileNotFoundError:
+                continue
+        return None
+
+    # ── Compaction ─────────────────────────────────────
+
+    def _ensure_compactor(self) -> None:
+        if self._compactor is None or self._compactor.done():
+            self._compactor = asyncio.create_task(self._compact_loop())
+
+    async def _compact_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                await self.compact()
+            except Exception:
+                logger.exception("Packfile compaction failed")
+
+    async def compact(self) -> None:
+        """Rewrite mostly-dead sealed segments and trim the index log."""
+        self._refresh()
+        for segment in sorted(self._size):
+            if not self._compactable(segment):
+                continue
+            async with self._locked():
+                # Another process may have compacted it in the meantime
+                if not self._compactable(segment):
+                    continue
+                live = {k: e for k, e in self._index.items() if e.segment == segment}
+                data = {k: await asyncio.to_thread(self._read, e) for k, e in live.items()}
+                await self._write_packed(data)
+                await asyncio.to_thread(_remove_if_exists, self._segment_path(segment))
+                self._size.pop(segment, None)
+                self._live.pop(segment, None)
+                self._counters["pack_compactions"] += 1
+
+        if self._index_records > 2 * len(self._index) + 1000:
+            async with self._locked():
+                records = [
+                    {"k": key, "s": e.segment, "o": e.offset, "n": e.length, "t": e.modified}
+                    for key, e in self._index.items()
+                ]
+                await asyncio.to_thread(self._rewrite_index, records)
+                self._refresh()
+
+    def _compactable(self, segment: int) -> bool:
+        size = self._size.get(segment, 0)
+        if segment == self._current or not size:
+            return False
+        return self._live.get(segment, 0) < size * COMPACT_LIVE_RATIO
+
+    def _rewrite_index(self, records: list[dict]) -> None:
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.index_path)
+
+    # ── StorageBackend ─────────────────────────────────
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self.put_many({key: data})
+
+    async def put_many(self, items: Mapping[str, bytes]) -> BatchResult:
+        small = {k: v for k, v in items.items() if len(v) < self.max_object_bytes}
+        large = {k: v for k, v in items.items() if len(v) >= self.max_object_bytes}
+        self._ensure_compactor()
+        result = BatchResult()
+        if small:
+            async with self._locked():
+                await self._write_packed(small)
+        if large:
+            async with self._locked():
+                await self._forget(large)
+            result = await self.backend.put_many(large)
+        return result
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        # Streams are for large uploads; they always go to the wrapped backend
+        async with self._locked():
+            await self._forget([key])
+        return await self.backend.put_stream(key, chunks)
+
+    async def get(self, key: str) -> bytes | None:
+        data = await self._read_packed(key)
+        if data is not None:
+            return data
+        return await self.backend.get(key)
+
+    async def get_range(self, key: str, offset: int, length: int) -> bytes | None:
+        data = await self._read_packed(key, offset, length)
+        if data is not None:
+            return data
+        return await self.backend.get_range(key, offset, length)
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        if self._entry(key) is not None:
+            return await super().get_stream(key, chunk_size, offset, length)
+        return await self.backend.get_stream(key, chunk_size, offset, length)
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        keys = list(keys)
+        self._refresh()
+        packed = [key for key in keys if key in self._index]
+        if packed:
+            async with self._locked():
+                await self._forget(packed)
+        # Packed keys go to the wrapped backend too: a key packed after a
+        # large put still has its old copy there
+        return await self.backend.delete_many(keys)
+
+    async def exists(self, key: str) -> bool:
+        return self._entry(key) is not None or await self.backend.exists(key)
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        entry = self._entry(key)
+        if entry is not None:
+            return ObjectInfo(size=entry.length)
+        return await self.backend.head(key)
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]] | None:
+        return await self.backend.presigned_put_url(key, expires_in, sha256)
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        return await self.backend.accept_upload(upload_key, key, size, sha256)
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str | None:
+        if self._entry(key) is not None:
+            return None
+        return await self.backend.presigned_get_url(key, expires_in, filename)
+
+    async def local_path(self, key: str) -> Path | None:
+        if self._entry(key) is not None:
+            return None
+        return await self.backend.local_path(key)
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        self._refresh()
+        for key, entry in list(self._index.items()):
+            if key.startswith(prefix):
+                yield key, datetime.fromtimestamp(entry.modified, tz=timezone.utc)
+        async for key, modified in self.backend.list_keys(prefix):
+            # Packed keys shadow a stale large copy of the same key
+            if key not in self._index:
+                yield key, modified
+
+    async def close(self) -> None:
+        if self._compactor is not None:
+            self._compactor.cancel()
+            self._compactor = None
+        self._lock_file.close()
+        await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self.backend.stats(),
+            **self._counters,
+            "pack_objects": len(self._index),
+            "pack_segments": len(self._size),
+            "pack_bytes": sum(self._size.values()),
+            "pack_live_bytes": sum(self._live.values()),
+        }
+
+
+def _remove_if_exists(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
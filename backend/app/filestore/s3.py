@@ -1,11 +1,31 @@
+import asyncio
+import base64
 import io
-from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator, Iterable
+from contextlib import AsyncExitStack
+from datetime import datetime
+from urllib.parse import quote
 
 import aioboto3
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
 
 from app.config import settings
-from app.filestore.base import StorageBackend
+from app.filestore.base import (
+    STREAM_CHUNK_SIZE,
+    BatchResult,
+    ObjectInfo,
+    StorageBackend,
+    chain_chunks,
+    upload_matches,
+)
+from app.filestore.hedging import HedgingPolicy
+
+# S3 requires every multipart part except the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
 
 
 class S3StorageBackend(StorageBackend):
@@ -15,42 +35,340 @@ class S3StorageBackend(StorageBackend):
         self.endpoint_url = settings.s3_endpoint_url or None
         self.aws_access_key_id = settings.s3_access_key_id
         self.aws_secret_access_key = settings.s3_secret_access_key
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self._exit_stack = AsyncExitStack()
+        self.part_size = max(settings.s3_multipart_part_size, MIN_PART_SIZE)
+        self.multipart_threshold = settings.s3_multipart_threshold
+        self.multipart_concurrency = max(settings.s3_multipart_concurrency, 1)
+        self.hedging = (
+            HedgingPolicy(
+                percentile=settings.s3_hedge_percentile,
+                max_rate=settings.s3_hedge_max_rate,
+                initial_delay=settings.s3_hedge_initial_delay_ms / 1000,
+            )
+            if settings.s3_hedged_reads
+            else None
+        )
 
-    @asynccontextmanager
     async def _get_client(self):
-        async with self.session.client(
-            "s3",
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-        ) as client:
-            yield client
+        """Return the shared S3 client, opening it on first use.
+
+        One client (and its keep-alive connection pool) lives for the whole
+        process so requests don't pay TLS and connection setup each time.
+        """
+        if self._client is not None:
+            return self._client
+        async with self._client_lock:
+            if self._client is None:
+                config = AioConfig(
+                    max_pool_connections=settings.s3_max_pool_connections,
+                    tcp_keepalive=True,
+                    connector_args={"keepalive_timeout": settings.s3_keepalive_timeout},
+                    # SigV4 signs the checksum header of presigned uploads
+                    signature_version="s3v4",
+                )
+                self._client = await self._exit_stack.enter_async_context(
+                    self.session.client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=self.aws_access_key_id,
+                        aws_secret_access_key=self.aws_secret_access_key,
+                        config=config,
+                    )
+                )
+        return self._client
+
+    def stats(self) -> dict[str, int]:
+        return self.hedging.stats() if self.hedging is not None else {}
+
+    async def close(self) -> None:
+        async with self._client_lock:
+            self._client = None
+            await self._exit_stack.aclose()
+            self._exit_stack = AsyncExitStack()
 
     async def put(self, key: str, data: bytes) -> None:
-        async with self._get_client() as client:
-            await client.put_object(Bucket=self.bucket, Key=key, Body=data)
+        if len(data) >= self.multipart_threshold:
+            await self._multipart_upload(key, _split(data, self.part_size))
+            return
+        client = await self._get_client()
+        await client.put_object(Bucket=self.bucket, Key=key, Body=data)
 
     async def get(self, key: str) -> bytes | None:
-        async with self._get_client() as client:
-            try:
-                response = await client.get_object(Bucket=self.bucket, Key=key)
-                async with response["Body"] as stream:
-                    return await stream.read()
-            except ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
-                    return None
-                raise
+        if self.hedging is not None:
+            return await self.hedging.run(lambda: self._get_object(key))
+        return await self._get_object(key)
+
+    async def _get_object(self, key: str) -> bytes | None:
+        client = await self._get_client()
+        try:
+            response = await client.get_object(Bucket=self.bucket, Key=key)
+            async with response["Body"] as stream:
+                return await stream.read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return None
+            raise
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Upload a stream without buffering it whole.
+
+        Streams shorter than the multipart threshold are sent with one PUT;
+        longer ones switch to a parallel multipart upload once the threshold
+        has been read, so memory stays at roughly threshold + in-flight parts.
+        """
+        written = 0
+
+        async def _counted() -> AsyncIterator[bytes]:
+            nonlocal written
+            async for part in _rechunk(chunks, self.part_size):
+                written += len(part)
+                yield part
+
+        parts = _counted()
+        head: list[bytes] = []
+        buffered = 0
+        async for part in parts:
+            head.append(part)
+            buffered += len(part)
+            if buffered >= self.multipart_threshold:
+                break
+        else:
+            client = await self._get_client()
+            await client.put_object(Bucket=self.bucket, Key=key, Body=b"".join(head))
+            return written
+
+        await self._multipart_upload(key, chain_chunks(head, parts))
+        return written
+
+    async def _multipart_upload(self, key: str, parts: AsyncIterator[bytes]) -> None:
+        """Upload parts with bounded concurrency; abort the upload if anything fails."""
+        client = await self._get_client()
+        created = await client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        upload_id = created["UploadId"]
+        # Each slot is held from the moment a part is read until it is uploaded,
+        # which also caps how many parts sit in memory at once.
+        slots = asyncio.Semaphore(self.multipart_concurrency)
+        tasks: list[asyncio.Task] = []
+        try:
+            part_number = 0
+            async for body in parts:
+                part_number += 1
+                await slots.acquire()
+                for task in tasks:
+                    if task.done() and task.exception() is not None:
+                        slots.release()
+                        raise task.exception()
+                tasks.append(asyncio.create_task(
+                    self._upload_part(client, key, upload_id, part_number, body, slots)
+                ))
+            uploaded = await asyncio.gather(*tasks)
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(uploaded)},
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    async def _upload_part(
+        self,
+        client,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        slots: asyncio.Semaphore,
+    ) -> dict:
+        try:
+            response = await client.upload_part(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=io.BytesIO(data),
+            )
+            return {"ETag": response["ETag"], "PartNumber": part_number}
+        finally:
+            slots.release()
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        client = await self._get_client()
+        params = {"Bucket": self.bucket, "Key": key}
+        if length == 0:
+            if not await self.exists(key):
+                return None
+            return _empty_stream()
+        if offset or length is not None:
+            end = "" if length is None else str(offset + length - 1)
+            params["Range"] = f"bytes={offset}-{end}"
+        try:
+            response = await client.get_object(**params)
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code == "NoSuchKey":
+                return None
+            if code == "InvalidRange":
+                # Offset at or past the end of the object
+                return _empty_stream()
+            raise
+
+        async def _iter() -> AsyncIterator[bytes]:
+            body = response["Body"]
+            async with body:
+                async for chunk in body.iter_chunks(chunk_size):
+                    yield chunk
+
+        return _iter()
 
     async def delete(self, key: str) -> None:
-        async with self._get_client() as client:
-            await client.delete_object(Bucket=self.bucket, Key=key)
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=key)
 
-    async def exists(self, key: str) -> bool:
-        async with self._get_client() as client:
+    async def delete_many(self, keys: Iterable[str]) -> BatchResult:
+        """Delete with DeleteObjects, up to DELETE_BATCH_SIZE keys per request."""
+        client = await self._get_client()
+        keys = list(keys)
+        result = BatchResult()
+        batches = [
+            keys[start:start + DELETE_BATCH_SIZE]
+            for start in range(0, len(keys), DELETE_BATCH_SIZE)
+        ]
+
+        async def _delete_batch(batch: list[str]) -> None:
             try:
-                await client.head_object(Bucket=self.bucket, Key=key)
-                return True
+                response = await client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
             except ClientError as e:
-                if e.response["Error"]["Code"] == "404":
-                    return False
-                raise
+                for key in batch:
+                    result.errors[key] = e
+                return
+            for error in response.get("Errors", []):
+                result.errors[error["Key"]] = ClientError(
+                    {"Error": {"Code": error.get("Code"), "Message": error.get("Message")}},
+                    "DeleteObjects",
+                )
+
+        slots = asyncio.Semaphore(self.batch_concurrency)
+
+        async def _bounded(batch: list[str]) -> None:
+            async with slots:
+                await _delete_batch(batch)
+
+        await asyncio.gather(*(_bounded(batch) for batch in batches))
+        return result
+
+    async def exists(self, key: str) -> bool:
+        client = await self._get_client()
+        try:
+            await client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "404":
+                return False
+            raise
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        client = await self._get_client()
+        try:
+            response = await client.head_object(
+                Bucket=self.bucket, Key=key, ChecksumMode="ENABLED"
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "404":
+                return None
+            raise
+        sha256 = None
+        checksum = response.get("ChecksumSHA256")
+        # Multipart objects carry a checksum of part checksums ("...-N")
+        if checksum and "-" not in checksum:
+            sha256 = base64.b64decode(checksum).hex()
+        return ObjectInfo(size=response["ContentLength"], sha256=sha256)
+
+    async def presigned_put_url(
+        self, key: str, expires_in: int, sha256: str | None = None
+    ) -> tuple[str, dict[str, str]]:
+        client = await self._get_client()
+        params = {"Bucket": self.bucket, "Key": key}
+        headers = {}
+        if sha256:
+            # S3 rejects an upload whose body doesn't match the signed checksum
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            params["ChecksumSHA256"] = checksum
+            headers["x-amz-checksum-sha256"] = checksum
+        url = await client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=expires_in
+        )
+        return url, headers
+
+    async def accept_upload(self, upload_key: str, key: str, size: int, sha256: str) -> bool:
+        if not upload_matches(await self.head(upload_key), size, sha256):
+            return False
+        client = await self._get_client()
+        # Copied server-side; a single PUT is at most 5 GiB, within copy_object's limit
+        await client.copy_object(
+            Bucket=self.bucket,
+            Key=key,
+            CopySource={"Bucket": self.bucket, "Key": upload_key},
+            ChecksumAlgorithm="SHA256",
+        )
+        await client.delete_object(Bucket=self.bucket, Key=upload_key)
+        return True
+
+    async def presigned_get_url(
+        self, key: str, expires_in: int, filename: str | None = None
+    ) -> str:
+        client = await self._get_client()
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = (
+                f"attachment; filename*=UTF-8''{quote(filename)}"
+            )
+        return await client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=expires_in
+        )
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        client = await self._get_client()
+        paginator = client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["LastModified"]
+
+
+async def _empty_stream() -> AsyncIterator[bytes]:
+    return
+    yield
+
+
+async def _split(data: bytes, part_size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), part_size):
+        yield data[start:start + part_size]
+
+
+async def _rechunk(chunks: AsyncIterator[bytes], part_size: int) -> AsyncIterator[bytes]:
+    """Regroup arbitrary chunks into parts of exactly ``part_size`` (the last may be short)."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
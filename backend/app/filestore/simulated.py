@@ -0,0 +1,170 @@
+import asyncio
+import json
+import math
+import random
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.filestore.base import STREAM_CHUNK_SIZE, ObjectInfo, StorageBackend
+
+# z-score of the 99th percentile of a standard normal distribution
+_Z99 = 2.326
+
+
+class SimulatedStorageError(Exception):
+    """Raised by SimulatedLatencyStorageBackend to inject a failed request."""
+
+
+@dataclass
+class LatencyProfile:
+    """Log-normal request latency fitted to a median and a 99th percentile.
+
+    A median of 0 adds no latency.
+    """
+
+    p50_ms: float
+    p99_ms: float
+
+    def __post_init__(self):
+        if self.p50_ms < 0 or self.p99_ms < self.p50_ms:
+            raise ValueError(
+                f"Latency needs 0 <= p50_ms <= p99_ms, got {self.p50_ms} and {self.p99_ms}"
+            )
+
+    def sample(self, rng: random.Random) -> float:
+        """One latency in seconds."""
+        if self.p50_ms == 0:
+            return 0.0
+        mu = math.log(self.p50_ms)
+        sigma = (math.log(self.p99_ms) - mu) / _Z99
+        return rng.lognormvariate(mu, sigma) / 1000
+
+
+# Rough S3 same-region numbers, used for operations the profile doesn't name
+DEFAULT_PROFILES = {
+    "get": LatencyProfile(p50_ms=15, p99_ms=120),
+    "put": LatencyProfile(p50_ms=30, p99_ms=250),
+    "delete": LatencyProfile(p50_ms=10, p99_ms=80),
+    "head": LatencyProfile(p50_ms=10, p99_ms=80),
+    "list": LatencyProfile(p50_ms=40, p99_ms=300),
+}
+
+
+class SimulatedLatencyStorageBackend(StorageBackend):
+    """Adds injected latency, bandwidth limits and failures to another backend.
+
+    Each request waits for a latency drawn from its operation's profile plus
+    the time to move its bytes at ``bytes_per_second``, and fails with its
+    operation's probability in ``error_rates``, or ``error_rate`` for
+    operations not named there. Meant for benchmarking service code against
+    S3-like tail latency without a network, usually around the in-memory backend.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        profiles: dict[str, LatencyProfile] | None = None,
+        bytes_per_second: float = 0,
+        error_rate: float = 0,
+        error_rates: dict[str, float] | None = None,
+        seed: int | None = None,
+    ):
+        unknown = set(error_rates or {}) - set(DEFAULT_PROFILES)
+        if unknown:
+            raise ValueError(f"Unknown operations in error_rates: {sorted(unknown)}")
+        self.backend = backend
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        self.bytes_per_second = bytes_per_second
+        self.error_rates = {op: error_rate for op in DEFAULT_PROFILES} | (error_rates or {})
+        self._rng = random.Random(seed)
+        self._counters = {
+            "simulated_requests": 0,
+            "simulated_errors": 0,
+            "simulated_delay_ms": 0,
+        }
+
+    @classmethod
+    def from_json(cls, backend: StorageBackend, profile: str) -> "SimulatedLatencyStorageBackend":
+        """Build from a JSON profile such as
+        ``{"get": {"p50_ms": 20, "p99_ms": 300}, "bytes_per_second": 50000000, "error_rate": 0.001}``.
+
+        ``"error_rates": {"put": 0.01}`` overrides ``error_rate`` per operation.
+        """
+        config = json.loads(profile) if profile.strip() else {}
+        profiles = {
+            op: LatencyProfile(**config[op]) for op in DEFAULT_PROFILES if op in config
+        }
+        return cls(
+            backend,
+            profiles=profiles,
+            bytes_per_second=config.get("bytes_per_second", 0),
+            error_rate=config.get("error_rate", 0),
+            error_rates=config.get("error_rates"),
+            seed=config.get("seed"),
+        )
+
+    def _transfer_time(self, size: int) -> float:
+        return size / self.bytes_per_second if self.bytes_per_second else 0
+
+    async def _request(self, op: str, size: int = 0) -> None:
+        self._counters["simulated_requests"] += 1
+        delay = self.profiles[op].sample(self._rng) + self._transfer_time(size)
+        self._counters["simulated_delay_ms"] += int(delay * 1000)
+        await asyncio.sleep(delay)
+        error_rate = self.error_rates[op]
+        if error_rate and self._rng.random() < error_rate:
+            self._counters["simulated_errors"] += 1
+            raise SimulatedStorageError(f"Injected {op} failure")
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._request("put", len(data))
+        await self.backend.put(key, data)
+
+    async def get(self, key: str) -> bytes | None:
+        data = await self.backend.get(key)
+        await self._request("get", len(data) if data is not None else 0)
+        return data
+
+    async def get_stream(
+        self,
+        key: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> AsyncIterator[bytes] | None:
+        # Latency to the first byte, then each chunk at the bandwidth cap
+        await self._request("get")
+        stream = await self.backend.get_stream(key, chunk_size, offset, length)
+        if stream is None:
+            return None
+
+        async def _iter() -> AsyncIterator[bytes]:
+            async for chunk in stream:
+                await asyncio.sleep(self._transfer_time(len(chunk)))
+                yield chunk
+
+        return _iter()
+
+    async def delete(self, key: str) -> None:
+        await self._request("delete")
+        await self.backend.delete(key)
+
+    async def exists(self, key: str) -> bool:
+        await self._request("head")
+        return await self.backend.exists(key)
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        await self._request("head")
+        return await self.backend.head(key)
+
+    async def list_keys(self, prefix: str = "") -> AsyncIterator[tuple[str, datetime]]:
+        await self._request("list")
+        async for entry in self.backend.list_keys(prefix):
+            yield entry
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict[str, int]:
+        return {**self.backend.stats(), **self._counters}
@@ -6,8 +6,9 @@ import uuid
 from contextlib import asynccontextmanager
 
 import jwt as pyjwt
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import select
 
 logger = logging.getLogger(__name__)
@@ -19,7 +20,13 @@ from app.models.user import User
 from app.models.workspace import Workspace
 from app.agent.agent import PlainerAgent
 from app.services import chat_service, file_service
-from app.dependencies import get_storage_backend
+from app.dependencies import (
+    Principal,
+    close_storage_backend,
+    get_current_principal,
+    get_storage_backend,
+)
+from app.pagination import NEXT_CURSOR_HEADER, InvalidCursor
 from app.websocket.manager import ws_manager
 
 # Active agent tasks keyed by conversation_id
@@ -28,7 +35,9 @@ _agent_tasks: dict[str, asyncio.Task] = {}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    get_storage_backend()
     yield
+    await close_storage_backend()
     await engine.dispose()
 
 
@@ -40,8 +49,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 app.include_router(api_router)
 
 
@@ -50,6 +65,12 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/health/storage")
+async def storage_health(user: Principal = Depends(get_current_principal)):
+    """Storage backend counters (cache hit/miss, etc.) for sizing and monitoring."""
+    return get_storage_backend().stats()
+
+
 async def _run_agent(
     drive_id: uuid.UUID,
     drive_name: str,
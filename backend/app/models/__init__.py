@@ -8,6 +8,7 @@ from app.models.chat import Conversation, Message
 from app.models.sharing import FileShare, FolderShare
 from app.models.app_type import AppType
 from app.models.marketplace import MarketplaceItem
+from app.models.blob import Blob
 
 __all__ = [
     "Base",
@@ -25,4 +26,5 @@ __all__ = [
     "FolderShare",
     "AppType",
     "MarketplaceItem",
+    "Blob",
 ]
@@ -1,8 +1,10 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Integer, SmallInteger, String, Text
-from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy import (
+    BigInteger, Boolean, DateTime, ForeignKey, Integer, SmallInteger, String, Text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, TimestampMixin, UUIDMixin
@@ -51,6 +53,11 @@ class File(UUIDMixin, TimestampMixin, Base):
 
     sort_order: Mapped[int] = mapped_column(SmallInteger, default=0, server_default="0")
 
+    # Full-text index over the name and the first 256K characters of the text
+    # content, set by the files_search_vector trigger on insert and whenever
+    # name or content_text change. Never loaded; only used in queries.
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, nullable=True, deferred=True)
+
     owner: Mapped["User"] = relationship("User", foreign_keys=[owner_id])
     workspace: Mapped["Workspace"] = relationship("Workspace")
     folder: Mapped["Folder | None"] = relationship("Folder")
@@ -74,9 +81,12 @@ class FileVersion(UUIDMixin, Base):
         UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), nullable=False
     )
     version_number: Mapped[int] = mapped_column(Integer, nullable=False)
-    storage_key: Mapped[str] = mapped_column(Text, nullable=False)
+    # Snapshot versions carry storage_key and content_text; delta versions only
+    # carry a line delta against the previous version (see version_service).
+    storage_key: Mapped[str | None] = mapped_column(Text, nullable=True)
     size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
     content_text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    delta: Mapped[str | None] = mapped_column(Text, nullable=True)
     change_summary: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_by_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id"), nullable=True
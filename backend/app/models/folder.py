@@ -28,7 +28,7 @@ class Folder(UUIDMixin, TimestampMixin, Base):
     sort_order: Mapped[int] = mapped_column(SmallInteger, default=0, server_default="0")
 
     owner: Mapped["User"] = relationship("User", foreign_keys=[owner_id])
-    workspace: Mapped["Workspace"] = relationship("Workspace")
+    workspace: Mapped["Workspace"] = relationship("Workspace", foreign_keys=[workspace_id])
     parent: Mapped["Folder | None"] = relationship("Folder", remote_side="Folder.id")
     created_by: Mapped["User | None"] = relationship("User", foreign_keys=[created_by_id])
 
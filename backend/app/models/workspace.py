@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, UniqueConstraint, func
+from sqlalchemy import BigInteger, DateTime, ForeignKey, String, Text, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,6 +18,17 @@ class Workspace(UUIDMixin, TimestampMixin, Base):
     owner_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
+    # Bumped by database triggers once per statement that changes files or
+    # folders in the workspace; used as an ETag for whole-workspace reads
+    # such as the folder tree
+    change_version: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    # Root "Files" folder new files go to by default; set once the workspace's
+    # system folders exist (see file_service.ensure_system_folders)
+    files_folder_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("folders.id", ondelete="SET NULL", use_alter=True),
+        nullable=True,
+    )
 
     owner: Mapped["User"] = relationship("User")
     members: Mapped[list["WorkspaceMember"]] = relationship(
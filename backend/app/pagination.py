@@ -0,0 +1,85 @@
+"""Keyset pagination with opaque cursors.
+
+A cursor encodes the sort key of the last row of a page; the next page
+continues strictly after it. Sort keys must end in a unique column (usually
+``id``) so rows with equal names or timestamps are neither skipped nor
+repeated.
+"""
+import base64
+import json
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+# List endpoints return the cursor for the next page in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    """The cursor wasn't produced by ``encode_cursor`` for these sort keys."""
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, (uuid.UUID, datetime)):
+        return str(value)
+    return value
+
+
+def _load(key: InstrumentedAttribute, value: Any) -> Any:
+    python_type = key.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    if not isinstance(value, python_type):
+        raise TypeError(f"Expected {python_type.__name__}")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[InstrumentedAttribute]) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("Wrong number of values")
+        return [_load(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def paginate(
+    query: Select,
+    keys: Sequence[InstrumentedAttribute],
+    cursor: str | None = None,
+    limit: int | None = None,
+    descending: bool = False,
+) -> Select:
+    """Order ``query`` by ``keys`` and restrict it to the page after ``cursor``."""
+    if cursor is not None:
+        values = decode_cursor(cursor, keys)
+        row = tuple_(*keys)
+        after = tuple_(*(literal(v, key.type) for key, v in zip(keys, values)))
+        query = query.where(row < after if descending else row > after)
+    query = query.order_by(*(key.desc() if descending else key for key in keys))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def next_cursor(
+    rows: Sequence[Any], keys: Sequence[InstrumentedAttribute], limit: int | None
+) -> str | None:
+    """Cursor for the page after ``rows``, or None if this was the last page."""
+    if limit is None or len(rows) < limit:
+        return None
+    return encode_cursor([getattr(rows[-1], key.key) for key in keys])
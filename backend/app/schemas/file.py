@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class FileCreate(BaseModel):
@@ -35,6 +35,11 @@ class FileResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class FileSearchResult(FileResponse):
+    rank: float
+    snippet: str
+
+
 class FileContentUpdate(BaseModel):
     content: str
 
@@ -52,6 +57,51 @@ class FileContentResponse(BaseModel):
     template_content: str | None = None
 
 
+class UploadUrlRequest(BaseModel):
+    name: str
+    size_bytes: int = Field(ge=0)
+    sha256: str = Field(pattern=r"^[0-9a-fA-F]{64}$")
+
+
+class UploadUrlResponse(BaseModel):
+    upload_url: str
+    storage_key: str
+    # Headers the client must send with the PUT
+    headers: dict[str, str]
+    expires_in: int
+
+
+class UploadCompleteRequest(BaseModel):
+    storage_key: str
+    name: str
+    size_bytes: int = Field(ge=0)
+    sha256: str = Field(pattern=r"^[0-9a-fA-F]{64}$")
+    folder_id: uuid.UUID | None = None
+
+
+class DownloadUrlResponse(BaseModel):
+    url: str
+    expires_in: int
+
+
+class FileVersionResponse(BaseModel):
+    id: uuid.UUID
+    version_number: int
+    size_bytes: int
+    change_summary: str | None = None
+    created_by_id: uuid.UUID | None = None
+    created_by_agent: bool
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class FileVersionContentResponse(BaseModel):
+    file_id: uuid.UUID
+    version_number: int
+    content: str
+
+
 class FolderCreate(BaseModel):
     name: str
     parent_id: uuid.UUID | None = None
@@ -71,6 +121,24 @@ class FolderResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class FolderTreeNode(BaseModel):
+    id: uuid.UUID
+    parent_id: uuid.UUID | None
+    name: str
+    path: str
+    is_favorite: bool
+    sort_order: int = 0
+    # Files directly in this folder; only set when stats are requested
+    file_count: int | None = None
+    size_bytes: int | None = None
+    children: list["FolderTreeNode"] = []
+
+
+class FolderTreeResponse(BaseModel):
+    version: int
+    folders: list[FolderTreeNode]
+
+
 class ShareRequest(BaseModel):
     email: str
     permission: str = "view"
@@ -131,6 +199,20 @@ class InstanceConfigUpdate(BaseModel):
     config: str
 
 
+class BulkFileRequest(BaseModel):
+    file_ids: list[uuid.UUID] = Field(min_length=1, max_length=5000)
+
+
+class BulkMoveRequest(BulkFileRequest):
+    # None moves/copies to the drive root
+    folder_id: uuid.UUID | None = None
+
+
+class BulkFileResponse(BaseModel):
+    # Files actually affected; for copies, the ids of the new files
+    file_ids: list[uuid.UUID]
+
+
 class ReorderItem(BaseModel):
     id: uuid.UUID
     sort_order: int
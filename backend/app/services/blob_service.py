@@ -0,0 +1,86 @@
+import hashlib
+from collections.abc import Mapping
+
+from sqlalchemy import Integer, Text, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.filestore.base import StorageBackend
+from app.models.blob import Blob
+
+# Storage key prefix for content-addressed blobs
+CAS_PREFIX = "cas/"
+
+
+def blob_key(digest: str) -> str:
+    return f"{CAS_PREFIX}{digest[:2]}/{digest}"
+
+
+def is_blob_key(storage_key: str | None) -> bool:
+    return storage_key is not None and storage_key.startswith(CAS_PREFIX)
+
+
+async def store_blob(
+    db: AsyncSession,
+    storage: StorageBackend,
+    data: bytes,
+    refs: int = 1,
+) -> str:
+    """Store data under its SHA-256 and add ``refs`` references. Returns the storage key.
+
+    The bytes are written when the digest has no other references; later
+    callers with identical content just bump the reference count. A blob
+    without references may already have been swept by the garbage collector,
+    so it is uploaded again.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    key = blob_key(digest)
+
+    stmt = (
+        insert(Blob)
+        .values(sha256=digest, storage_key=key, size_bytes=len(data), ref_count=refs)
+        .on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"ref_count": Blob.ref_count + refs},
+        )
+        # Only this call's references: a new row, or one that had none left
+        .returning((Blob.ref_count == refs).label("unreferenced"))
+    )
+    unreferenced = (await db.execute(stmt)).scalar_one()
+    if unreferenced:
+        await storage.put(key, data)
+    return key
+
+
+async def release_blob(
+    db: AsyncSession, storage_key: str | None, refs: int = 1
+) -> None:
+    """Drop references to a blob. Keys outside the content-addressed store are ignored."""
+    if not is_blob_key(storage_key):
+        return
+    digest = storage_key.rsplit("/", 1)[-1]
+    await db.execute(
+        update(Blob)
+        .where(Blob.sha256 == digest)
+        .values(ref_count=func.greatest(Blob.ref_count - refs, 0))
+    )
+
+
+async def retain_blobs(db: AsyncSession, refs: Mapping[str, int]) -> None:
+    """Add references to blobs that already exist, e.g. when copying files.
+
+    ``refs`` maps storage keys to the number of new references; keys outside
+    the content-addressed store are ignored. Runs as a single statement.
+    """
+    refs = {key: count for key, count in refs.items() if is_blob_key(key)}
+    if not refs:
+        return
+    added = select(
+        func.unnest(literal(list(refs), ARRAY(Text))).label("storage_key"),
+        func.unnest(literal(list(refs.values()), ARRAY(Integer))).label("refs"),
+    ).subquery()
+    await db.execute(
+        update(Blob)
+        .where(Blob.storage_key == added.c.storage_key)
+        .values(ref_count=Blob.ref_count + added.c.refs)
+    )
@@ -1,20 +1,29 @@
+import hashlib
 import io
 import mimetypes
 import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
 import mammoth
-from sqlalchemy import select, func, or_
+from sqlalchemy import any_, case, false, func, insert, literal, select, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import defer, selectinload
 
+from app.cache import TTLCache
+from app.config import settings
 from app.models.app_type import AppType
 from app.models.file import File, FileVersion
 from app.models.folder import Folder
 from app.models.sharing import FileShare, FolderShare
 from app.models.user import User
 from app.models.workspace import Workspace, WorkspaceMember
+from app.pagination import paginate
 from app.filestore.base import StorageBackend
+from app.filestore.batch import WriteBatch
+from app.services import blob_service, version_service
 
 
 def detect_file_type(mime_type: str, filename: str) -> str:
@@ -56,6 +65,31 @@ def convert_docx_to_html(docx_bytes: bytes) -> str:
     return result.value
 
 
+@dataclass(frozen=True)
+class DriveRef:
+    """The ids of a user's drive, which is what most request handlers need.
+
+    The drive's name can change, so it isn't cached; use ``get_user_drive`` for it.
+    """
+
+    id: uuid.UUID
+    owner_id: uuid.UUID
+
+
+# user id -> drive ids. A user's drive never changes once created.
+_drive_cache: TTLCache[uuid.UUID, DriveRef] = TTLCache(ttl=settings.drive_cache_ttl)
+
+
+async def get_user_drive_ref(db: AsyncSession, user_id: uuid.UUID) -> DriveRef:
+    """Like ``get_user_drive`` but served from an in-process cache after the first call."""
+    drive = _drive_cache.get(user_id)
+    if drive is None:
+        workspace = await get_user_drive(db, user_id)
+        drive = DriveRef(id=workspace.id, owner_id=workspace.owner_id)
+        _drive_cache.set(user_id, drive)
+    return drive
+
+
 async def get_user_drive(db: AsyncSession, user_id: uuid.UUID) -> Workspace:
     """Get the user's personal drive (workspace). Auto-creates one if missing."""
     result = await db.execute(
@@ -109,8 +143,8 @@ async def create_file_from_content(
     content_bytes = content.encode("utf-8")
     size_bytes = len(content_bytes)
 
-    storage_key = f"{workspace_id}/{uuid.uuid4()}/{name}"
-    await storage.put(storage_key, content_bytes)
+    # One reference for the file, one for its initial version
+    storage_key = await blob_service.store_blob(db, storage, content_bytes, refs=2)
 
     file = File(
         owner_id=owner_id,
@@ -160,8 +194,7 @@ async def create_file_from_binary(
     file_type = detect_file_type(mime_type, name)
     size_bytes = len(data)
 
-    storage_key = f"{workspace_id}/{uuid.uuid4()}/{name}"
-    await storage.put(storage_key, data)
+    storage_key = await blob_service.store_blob(db, storage, data, refs=2)
 
     # For docx files, convert to HTML and store in content_text
     content_text = None
@@ -202,6 +235,139 @@ async def create_file_from_binary(
     return file
 
 
+async def create_file_from_stream(
+    db: AsyncSession,
+    storage: StorageBackend,
+    workspace_id: uuid.UUID,
+    name: str,
+    chunks: AsyncIterator[bytes],
+    owner_id: uuid.UUID,
+    folder_id: uuid.UUID | None = None,
+    created_by_id: uuid.UUID | None = None,
+) -> File:
+    """Create a file from an upload stream without holding it all in memory.
+
+    Docx uploads are still read whole because they are converted to HTML.
+    """
+    if is_docx_file(name):
+        data = b"".join([chunk async for chunk in chunks])
+        return await create_file_from_binary(
+            db=db,
+            storage=storage,
+            workspace_id=workspace_id,
+            name=name,
+            data=data,
+            owner_id=owner_id,
+            folder_id=folder_id,
+            created_by_id=created_by_id,
+        )
+
+    storage_key = f"{workspace_id}/{uuid.uuid4()}/{name}"
+    size_bytes = await storage.put_stream(storage_key, chunks)
+    return await _add_stored_file(
+        db, workspace_id, name, storage_key, size_bytes, owner_id, folder_id, created_by_id
+    )
+
+
+def upload_key(workspace_id: uuid.UUID, name: str) -> str:
+    """Storage key for a direct (presigned) upload into a workspace."""
+    return f"{workspace_id}/uploads/{uuid.uuid4()}/{name}"
+
+
+async def accept_uploaded_object(
+    storage: StorageBackend,
+    upload_key: str,
+    workspace_id: uuid.UUID,
+    name: str,
+    size_bytes: int,
+    sha256: str,
+) -> str | None:
+    """Move a checked direct upload to a fresh key in the workspace and return that key.
+
+    The presigned URL stays usable until it expires, so files never point at
+    the upload key itself. None if the upload is missing or doesn't match the
+    announced size and SHA-256.
+    """
+    storage_key = f"{workspace_id}/{uuid.uuid4()}/{name}"
+    if not await storage.accept_upload(upload_key, storage_key, size_bytes, sha256):
+        return None
+    return storage_key
+
+
+async def create_file_from_uploaded_object(
+    db: AsyncSession,
+    storage: StorageBackend,
+    workspace_id: uuid.UUID,
+    name: str,
+    storage_key: str,
+    size_bytes: int,
+    owner_id: uuid.UUID,
+    folder_id: uuid.UUID | None = None,
+    created_by_id: uuid.UUID | None = None,
+) -> File:
+    """Create the rows for an object already uploaded straight to storage."""
+    if is_docx_file(name):
+        # Docx needs converting, so it's stored like a regular upload and the
+        # uploaded original is left unreferenced for the storage GC
+        data = await storage.get(storage_key)
+        return await create_file_from_binary(
+            db=db,
+            storage=storage,
+            workspace_id=workspace_id,
+            name=name,
+            data=data,
+            owner_id=owner_id,
+            folder_id=folder_id,
+            created_by_id=created_by_id,
+        )
+
+    return await _add_stored_file(
+        db, workspace_id, name, storage_key, size_bytes, owner_id, folder_id, created_by_id
+    )
+
+
+async def _add_stored_file(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    name: str,
+    storage_key: str,
+    size_bytes: int,
+    owner_id: uuid.UUID,
+    folder_id: uuid.UUID | None,
+    created_by_id: uuid.UUID | None,
+) -> File:
+    mime_type = detect_mime_type(name)
+    file_type = detect_file_type(mime_type, name)
+
+    file = File(
+        owner_id=owner_id,
+        workspace_id=workspace_id,
+        folder_id=folder_id,
+        name=name,
+        mime_type=mime_type,
+        size_bytes=size_bytes,
+        storage_key=storage_key,
+        file_type=file_type,
+        created_by_id=created_by_id,
+    )
+    db.add(file)
+    await db.flush()
+
+    version = FileVersion(
+        file_id=file.id,
+        version_number=1,
+        storage_key=storage_key,
+        size_bytes=size_bytes,
+        change_summary="Initial version",
+        created_by_id=created_by_id,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(version)
+    await db.flush()
+
+    return file
+
+
 async def get_app_type_by_slug(
     db: AsyncSession, slug: str, workspace_id: uuid.UUID | None = None
 ) -> AppType | None:
@@ -254,17 +420,23 @@ async def create_app_type(
     return app
 
 
+# Listings return FileResponse, which never includes the file body. Leaving
+# content_text out keeps listing cost proportional to the number of rows.
+LISTING_OPTIONS = (selectinload(File.app_type), defer(File.content_text))
+
+
 async def get_instances_for_file(
     db: AsyncSession, file_id: uuid.UUID
 ) -> list[File]:
     """Get all instances linked to a data file (primary or related)."""
     result = await db.execute(
         select(File)
-        .options(selectinload(File.app_type))
+        .options(*LISTING_OPTIONS)
         .where(
             or_(
                 File.source_file_id == file_id,
-                File.related_source_ids.any(file_id),
+                # @> rather than = ANY() so ix_files_related_source_ids applies
+                File.related_source_ids.contains([file_id]),
             ),
             File.is_instance.is_(True),
             File.deleted_at.is_(None),
@@ -303,8 +475,7 @@ async def create_instance(
         store_bytes = instance_config.encode("utf-8")
         mime = "application/json"
 
-    s_key = f"{source_file.workspace_id}/{uuid.uuid4()}/{instance_name}"
-    await storage.put(s_key, store_bytes)
+    s_key = await blob_service.store_blob(db, storage, store_bytes)
 
     instance = File(
         owner_id=source_file.owner_id,
@@ -346,28 +517,37 @@ async def auto_create_instances_for_file(
     elif ext in ("md", "markdown", "doc", "docx") or file.file_type == "document":
         default_slug = "document"
 
-    # Create default viewer instance
-    if default_slug:
-        app_type = await get_app_type_by_slug(db, default_slug, file.workspace_id)
-        if app_type:
-            instance = await create_instance(db, storage, file, app_type)
+    async with WriteBatch(storage) as batch:
+        # Create default viewer instance
+        if default_slug:
+            app_type = await get_app_type_by_slug(db, default_slug, file.workspace_id)
+            if app_type:
+                instance = await create_instance(db, batch, file, app_type)
+                instances.append(instance)
+
+        # Create text editor instance
+        editor_type = await get_app_type_by_slug(db, "text-editor", file.workspace_id)
+        if editor_type:
+            instance = await create_instance(db, batch, file, editor_type)
             instances.append(instance)
 
-    # Create text editor instance
-    editor_type = await get_app_type_by_slug(db, "text-editor", file.workspace_id)
-    if editor_type:
-        instance = await create_instance(db, storage, file, editor_type)
-        instances.append(instance)
-
     return instances
 
 
+# Keyset sort keys for paginated listings (see app.pagination)
+FOLDER_ORDER = (File.sort_order, File.name, File.id)
+NAME_ORDER = (File.name, File.id)
+RECENT_ORDER = (File.updated_at, File.id)
+
+
 async def list_drive_files(
     db: AsyncSession,
     workspace_id: uuid.UUID,
     folder_id: uuid.UUID | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
 ) -> list[File]:
-    query = select(File).options(selectinload(File.app_type)).where(
+    query = select(File).options(*LISTING_OPTIONS).where(
         File.workspace_id == workspace_id,
         File.deleted_at.is_(None),
     )
@@ -376,7 +556,7 @@ async def list_drive_files(
     else:
         query = query.where(File.folder_id.is_(None))
 
-    query = query.order_by(File.sort_order, File.name)
+    query = paginate(query, FOLDER_ORDER, cursor, limit)
     result = await db.execute(query)
     return list(result.scalars().all())
 
@@ -384,37 +564,46 @@ async def list_drive_files(
 async def list_all_workspace_files(
     db: AsyncSession,
     workspace_id: uuid.UUID,
+    limit: int | None = None,
+    cursor: str | None = None,
 ) -> list[File]:
-    """List all non-deleted files in a workspace, regardless of folder."""
-    result = await db.execute(
+    """List all non-deleted files in a workspace, regardless of folder.
+
+    Used for the agent's file overview, so instance_config is left out too.
+    """
+    query = (
         select(File)
-        .options(selectinload(File.app_type))
+        .options(*LISTING_OPTIONS, defer(File.instance_config))
         .where(
             File.workspace_id == workspace_id,
             File.deleted_at.is_(None),
-        ).order_by(File.name)
+        )
     )
+    result = await db.execute(paginate(query, NAME_ORDER, cursor, limit))
     return list(result.scalars().all())
 
 
 async def list_shared_with_me(
-    db: AsyncSession, user_id: uuid.UUID
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    limit: int | None = None,
+    cursor: str | None = None,
 ) -> list[File]:
-    result = await db.execute(
+    query = (
         select(File)
-        .options(selectinload(File.app_type))
+        .options(*LISTING_OPTIONS)
         .join(FileShare, FileShare.file_id == File.id)
         .where(
             FileShare.shared_with_id == user_id,
             File.deleted_at.is_(None),
         )
-        .order_by(File.name)
     )
+    result = await db.execute(paginate(query, NAME_ORDER, cursor, limit))
     return list(result.scalars().all())
 
 
 async def list_recent_files(
-    db: AsyncSession, user_id: uuid.UUID, limit: int = 20
+    db: AsyncSession, user_id: uuid.UUID, limit: int = 20, cursor: str | None = None
 ) -> list[File]:
     """Recent files owned by user or shared with them."""
     owned = select(File.id).where(
@@ -423,15 +612,16 @@ async def list_recent_files(
     )
     shared = select(FileShare.file_id).where(FileShare.shared_with_id == user_id)
 
-    result = await db.execute(
+    query = (
         select(File)
-        .options(selectinload(File.app_type))
+        .options(*LISTING_OPTIONS)
         .where(
             File.deleted_at.is_(None),
             or_(File.id.in_(owned), File.id.in_(shared)),
         )
-        .order_by(File.updated_at.desc())
-        .limit(limit)
+    )
+    result = await db.execute(
+        paginate(query, RECENT_ORDER, cursor, limit, descending=True)
     )
     return list(result.scalars().all())
 
@@ -472,15 +662,44 @@ async def get_file_content(
     return data.decode("utf-8")
 
 
+async def get_file_stream(
+    storage: StorageBackend,
+    file: File,
+    offset: int = 0,
+    length: int | None = None,
+) -> AsyncIterator[bytes] | None:
+    """Stream a file's stored bytes, falling back to its inline text if the blob is missing.
+
+    ``offset``/``length`` select a byte range so previews only fetch what they show.
+    """
+    stream = await storage.get_stream(file.storage_key, offset=offset, length=length)
+    if stream is not None:
+        return stream
+    text = file.content_text
+    if text is None and file.is_instance:
+        text = file.instance_config or "{}"
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    end = len(data) if length is None else offset + length
+
+    async def _iter() -> AsyncIterator[bytes]:
+        yield data[offset:end]
+
+    return _iter()
+
+
 async def list_instances_by_app_type(
     db: AsyncSession,
     workspace_id: uuid.UUID,
     app_type_slug: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
 ) -> list[File]:
     """List all instances in a workspace, optionally filtered by app type slug."""
     query = (
         select(File)
-        .options(selectinload(File.app_type))
+        .options(*LISTING_OPTIONS)
         .where(
             File.workspace_id == workspace_id,
             File.is_instance.is_(True),
@@ -491,7 +710,8 @@ async def list_instances_by_app_type(
         query = query.join(AppType, File.app_type_id == AppType.id).where(
             AppType.slug == app_type_slug
         )
-    return list((await db.execute(query.order_by(File.name))).scalars().all())
+    query = paginate(query, NAME_ORDER, cursor, limit)
+    return list((await db.execute(query)).scalars().all())
 
 
 async def list_drive_folders(
@@ -509,6 +729,65 @@ async def list_drive_folders(
     return list(result.scalars().all())
 
 
+async def get_workspace_change_version(db: AsyncSession, workspace_id: uuid.UUID) -> int:
+    result = await db.execute(
+        select(Workspace.change_version).where(Workspace.id == workspace_id)
+    )
+    return result.scalar_one()
+
+
+async def get_folder_tree(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    root_id: uuid.UUID | None = None,
+    with_stats: bool = False,
+) -> list[tuple[Folder, int | None, int | None]]:
+    """All folders in a workspace, or under ``root_id``, ordered by path.
+
+    Returns (folder, file_count, size_bytes) rows; the counts cover files
+    directly inside each folder and are None unless ``with_stats`` is set.
+    """
+    query = select(Folder).where(Folder.workspace_id == workspace_id)
+    if root_id:
+        result = await db.execute(
+            select(Folder.path).where(Folder.id == root_id, Folder.workspace_id == workspace_id)
+        )
+        root_path = result.scalar_one_or_none()
+        if root_path is None:
+            raise ValueError("Folder not found")
+        # Paths end in "/", so the subtree is the range [root_path, root_path with
+        # "/" bumped to "0"). Range operators keep ix_folders_workspace_path usable
+        # with bound parameters, which LIKE 'prefix%' is not.
+        query = query.where(
+            Folder.path.op("~>=~")(root_path),
+            Folder.path.op("~<~")(root_path[:-1] + "0"),
+        )
+
+    if with_stats:
+        stats = (
+            select(
+                File.folder_id,
+                func.count().label("file_count"),
+                func.sum(File.size_bytes).label("size_bytes"),
+            )
+            .where(
+                File.workspace_id == workspace_id,
+                File.folder_id.is_not(None),
+                File.deleted_at.is_(None),
+            )
+            .group_by(File.folder_id)
+            .subquery()
+        )
+        query = query.add_columns(
+            func.coalesce(stats.c.file_count, 0), func.coalesce(stats.c.size_bytes, 0)
+        ).outerjoin(stats, stats.c.folder_id == Folder.id)
+        result = await db.execute(query.order_by(Folder.path))
+        return [(row[0], row[1], row[2]) for row in result.all()]
+
+    result = await db.execute(query.order_by(Folder.path))
+    return [(folder, None, None) for folder in result.scalars().all()]
+
+
 async def reorder_files(
     db: AsyncSession,
     workspace_id: uuid.UUID,
@@ -517,7 +796,9 @@ async def reorder_files(
     """Batch-update sort_order for files."""
     ids = [item.id for item in items]
     result = await db.execute(
-        select(File).where(File.id.in_(ids), File.workspace_id == workspace_id)
+        select(File)
+        .options(defer(File.content_text), defer(File.instance_config))
+        .where(File.id.in_(ids), File.workspace_id == workspace_id)
     )
     files_by_id = {f.id: f for f in result.scalars().all()}
     for item in items:
@@ -543,6 +824,151 @@ async def reorder_folders(
             f.sort_order = item.sort_order
 
 
+# ── Bulk operations ────────────────────────────────────
+# Each runs as one set-based statement over ``id = ANY(:ids)`` and leaves
+# committing to the caller, so a whole batch lands in a single transaction.
+
+def _ids_param(ids: list[uuid.UUID]):
+    return literal(list(ids), ARRAY(UUID(as_uuid=True)))
+
+
+async def _check_folder(
+    db: AsyncSession, workspace_id: uuid.UUID, folder_id: uuid.UUID | None
+) -> None:
+    if folder_id is None:
+        return
+    result = await db.execute(
+        select(Folder.id).where(Folder.id == folder_id, Folder.workspace_id == workspace_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise ValueError("Folder not found")
+
+
+async def move_files(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    file_ids: list[uuid.UUID],
+    folder_id: uuid.UUID | None,
+) -> list[uuid.UUID]:
+    """Move live files into ``folder_id`` (None for the root). Returns the moved ids."""
+    await _check_folder(db, workspace_id, folder_id)
+    result = await db.execute(
+        update(File)
+        .where(
+            File.id == any_(_ids_param(file_ids)),
+            File.workspace_id == workspace_id,
+            File.deleted_at.is_(None),
+        )
+        .values(folder_id=folder_id)
+        .returning(File.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+
+async def delete_files(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    file_ids: list[uuid.UUID],
+) -> list[tuple[uuid.UUID, str]]:
+    """Soft-delete live files. Returns (id, name) of the deleted files."""
+    result = await db.execute(
+        update(File)
+        .where(
+            File.id == any_(_ids_param(file_ids)),
+            File.workspace_id == workspace_id,
+            File.deleted_at.is_(None),
+        )
+        .values(deleted_at=func.now())
+        .returning(File.id, File.name)
+        .execution_options(synchronize_session=False)
+    )
+    return [(row.id, row.name) for row in result.all()]
+
+
+async def restore_files(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    file_ids: list[uuid.UUID],
+) -> list[uuid.UUID]:
+    """Undo a soft delete. Returns the restored ids."""
+    result = await db.execute(
+        update(File)
+        .where(
+            File.id == any_(_ids_param(file_ids)),
+            File.workspace_id == workspace_id,
+            File.deleted_at.is_not(None),
+        )
+        .values(deleted_at=None)
+        .returning(File.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars().all())
+
+
+async def copy_files(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    file_ids: list[uuid.UUID],
+    folder_id: uuid.UUID | None,
+    user_id: uuid.UUID,
+) -> list[uuid.UUID]:
+    """Copy live files into ``folder_id``, sharing their stored bytes. Returns the new ids.
+
+    Copies into the folder a file already lives in are named "Copy of ...".
+    Version history is not copied.
+    """
+    await _check_folder(db, workspace_id, folder_id)
+    now = func.now()
+    name = case(
+        (
+            File.folder_id.is_not_distinct_from(folder_id),
+            func.left(literal("Copy of ") + File.name, 255),
+        ),
+        else_=File.name,
+    )
+    copied = {
+        File.id: func.gen_random_uuid(),
+        File.owner_id: literal(user_id, UUID(as_uuid=True)),
+        File.workspace_id: File.workspace_id,
+        File.folder_id: literal(folder_id, UUID(as_uuid=True)),
+        File.name: name,
+        File.mime_type: File.mime_type,
+        File.size_bytes: File.size_bytes,
+        File.storage_key: File.storage_key,
+        File.file_type: File.file_type,
+        File.content_text: File.content_text,
+        File.is_vibe_file: File.is_vibe_file,
+        File.is_favorite: false(),
+        File.created_by_id: literal(user_id, UUID(as_uuid=True)),
+        File.created_by_agent: false(),
+        File.is_instance: File.is_instance,
+        File.app_type_id: File.app_type_id,
+        File.source_file_id: File.source_file_id,
+        File.related_source_ids: File.related_source_ids,
+        File.instance_config: File.instance_config,
+        File.sort_order: File.sort_order,
+        File.created_at: now,
+        File.updated_at: now,
+    }
+    source = select(*copied.values()).where(
+        File.id == any_(_ids_param(file_ids)),
+        File.workspace_id == workspace_id,
+        File.deleted_at.is_(None),
+    )
+    result = await db.execute(
+        insert(File)
+        .from_select([column.key for column in copied], source, include_defaults=False)
+        .returning(File.id, File.storage_key)
+    )
+    rows = result.all()
+    refs: dict[str, int] = {}
+    for row in rows:
+        refs[row.storage_key] = refs.get(row.storage_key, 0) + 1
+    await blob_service.retain_blobs(db, refs)
+    return [row.id for row in rows]
+
+
 async def get_or_create_system_folder(
     db: AsyncSession,
     workspace_id: uuid.UUID,
@@ -563,32 +989,52 @@ async def get_or_create_system_folder(
     return await create_folder(db, workspace_id, owner_id, name)
 
 
+# workspace id -> Files folder id, once recorded on the workspace
+_files_folder_cache: TTLCache[uuid.UUID, uuid.UUID] = TTLCache(ttl=settings.drive_cache_ttl)
+
+
 async def ensure_system_folders(
     db: AsyncSession,
     workspace_id: uuid.UUID,
     owner_id: uuid.UUID,
-) -> Folder:
-    """Ensure the Files root folder exists. Returns files_folder.
+) -> uuid.UUID:
+    """Ensure the Files root folder exists. Returns its id.
 
-    Also migrates any orphaned root-level files into the Files folder.
+    The id is recorded in ``Workspace.files_folder_id``. Only the first call
+    for a workspace without it finds or creates the folder and moves orphaned
+    root-level files into it; afterwards this is a cached lookup.
     """
-    files = await get_or_create_system_folder(db, workspace_id, owner_id, "Files")
+    folder_id = _files_folder_cache.get(workspace_id)
+    if folder_id is not None:
+        return folder_id
 
-    # Migrate orphaned root files into the Files folder
     result = await db.execute(
-        select(File).where(
+        select(Workspace.files_folder_id).where(Workspace.id == workspace_id)
+    )
+    folder_id = result.scalar_one_or_none()
+    # A marker this session wrote may not be committed yet, and could roll back
+    uncommitted = db.info.setdefault("uncommitted_files_folders", set())
+    if folder_id is not None:
+        if workspace_id not in uncommitted:
+            _files_folder_cache.set(workspace_id, folder_id)
+        return folder_id
+
+    files = await get_or_create_system_folder(db, workspace_id, owner_id, "Files")
+    await db.execute(
+        update(File)
+        .where(
             File.workspace_id == workspace_id,
             File.folder_id.is_(None),
             File.deleted_at.is_(None),
         )
+        .values(folder_id=files.id)
+        .execution_options(synchronize_session=False)
     )
-    orphans = list(result.scalars().all())
-    for f in orphans:
-        f.folder_id = files.id
-    if orphans:
-        await db.flush()
-
-    return files
+    await db.execute(
+        update(Workspace).where(Workspace.id == workspace_id).values(files_folder_id=files.id)
+    )
+    uncommitted.add(workspace_id)
+    return files.id
 
 
 async def create_folder(
@@ -642,15 +1088,17 @@ async def toggle_folder_favorite(
 
 
 async def list_favorite_files(
-    db: AsyncSession, workspace_id: uuid.UUID
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    limit: int | None = None,
+    cursor: str | None = None,
 ) -> list[File]:
-    result = await db.execute(
-        select(File).where(
-            File.workspace_id == workspace_id,
-            File.is_favorite.is_(True),
-            File.deleted_at.is_(None),
-        ).order_by(File.name)
+    query = select(File).options(*LISTING_OPTIONS).where(
+        File.workspace_id == workspace_id,
+        File.is_favorite.is_(True),
+        File.deleted_at.is_(None),
     )
+    result = await db.execute(paginate(query, NAME_ORDER, cursor, limit))
     return list(result.scalars().all())
 
 
@@ -666,6 +1114,62 @@ async def list_favorite_folders(
     return list(result.scalars().all())
 
 
+# Text search config and the prefix of content_text indexed by File.search_vector
+SEARCH_CONFIG = "english"
+SEARCH_CONTENT_CHARS = 262144
+_HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>"
+
+
+def _escape_html(text):
+    """Escape text content in SQL, so the only markup in a headline is ts_headline's own."""
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        text = func.replace(text, char, entity)
+    return text
+
+
+async def search_files(
+    db: AsyncSession,
+    workspace_id: uuid.UUID,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+) -> list[tuple[File, float, str]]:
+    """Full-text search over file names and text content, best matches first.
+
+    ``query`` uses web search syntax ("quoted phrases", ``or``, ``-excluded``).
+    Returns (file, rank, snippet). The snippet is HTML: the content is escaped
+    and matches are wrapped in <mark>.
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(File.search_vector, tsquery).label("rank")
+    hits = (
+        select(File.id, rank)
+        .where(
+            File.workspace_id == workspace_id,
+            File.deleted_at.is_(None),
+            File.search_vector.op("@@")(tsquery),
+        )
+        .order_by(rank.desc(), File.id)
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+    # Headlines are expensive, so only build them for the rows on this page
+    snippet = func.ts_headline(
+        SEARCH_CONFIG,
+        _escape_html(func.left(func.coalesce(File.content_text, File.name), SEARCH_CONTENT_CHARS)),
+        tsquery,
+        _HEADLINE_OPTIONS,
+    )
+    result = await db.execute(
+        select(File, hits.c.rank, snippet)
+        .options(*LISTING_OPTIONS)
+        .join(hits, hits.c.id == File.id)
+        .order_by(hits.c.rank.desc(), File.id)
+    )
+    return [(row[0], row[1], row[2]) for row in result.all()]
+
+
 async def share_file(
     db: AsyncSession,
     file_id: uuid.UUID,
@@ -690,38 +1194,49 @@ async def update_file_content(
     file: File,
     new_content: str,
     updated_by_id: uuid.UUID | None = None,
-) -> File:
-    """Update a file's text content and create a new version."""
-    content_bytes = new_content.encode("utf-8")
-    storage_key = f"{file.workspace_id}/{uuid.uuid4()}/{file.name}"
-    await storage.put(storage_key, content_bytes)
+    change_summary: str | None = "Content updated",
+    created_by_agent: bool = False,
+) -> tuple[File, FileVersion]:
+    """Update a file's text content and create a new version.
 
-    # Get next version number
-    result = await db.execute(
-        select(func.coalesce(func.max(FileVersion.version_number), 0)).where(
-            FileVersion.file_id == file.id
-        )
+    Returns the file and the new version. Versions between snapshots only
+    store a diff, see ``version_service``.
+    """
+    content_bytes = new_content.encode("utf-8")
+    version = await version_service.build_text_version(db, file.id, new_content)
+    version.change_summary = change_summary
+    version.created_by_id = updated_by_id
+    version.created_by_agent = created_by_agent
+    version.created_at = datetime.now(timezone.utc)
+
+    # The file holds a reference to its blob, and so does a snapshot version.
+    # The file's old blob stays referenced only if its version was a snapshot.
+    is_snapshot = version.content_text is not None
+    storage_key = await blob_service.store_blob(
+        db, storage, content_bytes, refs=2 if is_snapshot else 1
     )
-    max_version = result.scalar()
+    await blob_service.release_blob(db, file.storage_key)
+    if is_snapshot:
+        version.storage_key = storage_key
 
     file.content_text = new_content
     file.size_bytes = len(content_bytes)
     file.storage_key = storage_key
 
-    version = FileVersion(
-        file_id=file.id,
-        version_number=max_version + 1,
-        storage_key=storage_key,
-        size_bytes=len(content_bytes),
-        content_text=new_content,
-        change_summary="Content updated",
-        created_by_id=updated_by_id,
-        created_at=datetime.now(timezone.utc),
-    )
     db.add(version)
     await db.flush()
 
-    return file
+    return file, version
+
+
+async def list_file_versions(db: AsyncSession, file_id: uuid.UUID) -> list[FileVersion]:
+    result = await db.execute(
+        select(FileVersion)
+        .where(FileVersion.file_id == file_id)
+        .options(defer(FileVersion.content_text), defer(FileVersion.delta))
+        .order_by(FileVersion.version_number.desc())
+    )
+    return list(result.scalars().all())
 
 
 async def share_folder(
@@ -1285,8 +1800,9 @@ async def seed_default_planner_content(
 ) -> None:
     """Create Personal & Company Planners with rich views — fast bulk insert.
 
-    Skips S3 writes (content_text is read first by get_file_content) and
-    FileVersion rows for speed. Single DB flush per planner.
+    Skips FileVersion rows for speed. Single DB flush per planner; the content
+    goes to the blob store at the end in one batch, written once per distinct
+    payload.
     """
     from app.models.marketplace import MarketplaceItem
 
@@ -1326,16 +1842,25 @@ async def seed_default_planner_content(
         at_map[item.slug] = app_type
     await db.flush()
 
+    # Blob key -> (bytes, number of files referencing it)
+    blobs: dict[str, tuple[bytes, int]] = {}
+
+    def _blob(data: bytes) -> str:
+        key = blob_service.blob_key(hashlib.sha256(data).hexdigest())
+        refs = blobs[key][1] if key in blobs else 0
+        blobs[key] = (data, refs + 1)
+        return key
+
     # Helper: create an instance File with explicit UUID
     def _make_instance(source_id: uuid.UUID, source: File, app_type: AppType) -> File:
         base = source.name.rsplit(".", 1)[0] if "." in source.name else source.name
         if app_type.renderer == "html-template":
             inst_name = f"{base} {app_type.label}.html"
             html = app_type.template_content or "{}"
-            ct, mime, sz = html, "text/html", len(html.encode())
+            ct, mime, data = html, "text/html", html.encode()
         else:
             inst_name = f"{base} {app_type.label}"
-            ct, mime, sz = None, "application/json", 2
+            ct, mime, data = None, "application/json", b"{}"
         return File(
             id=uuid.uuid4(),
             owner_id=source.owner_id,
@@ -1343,8 +1868,8 @@ async def seed_default_planner_content(
             folder_id=source.folder_id,
             name=inst_name,
             mime_type=mime,
-            size_bytes=sz,
-            storage_key=f"{workspace_id}/{uuid.uuid4()}/{inst_name}",
+            size_bytes=len(data),
+            storage_key=_blob(data),
             file_type="instance",
             content_text=ct,
             is_instance=True,
@@ -1382,7 +1907,7 @@ async def seed_default_planner_content(
                 name=name,
                 mime_type=mime_type,
                 size_bytes=len(content_bytes),
-                storage_key=f"{workspace_id}/{uuid.uuid4()}/{name}",
+                storage_key=_blob(content_bytes),
                 file_type=file_type,
                 content_text=content,
                 created_by_id=owner_id,
@@ -1418,13 +1943,18 @@ async def seed_default_planner_content(
             name=dashboard_name,
             mime_type="text/html",
             size_bytes=len(dashboard_bytes),
-            storage_key=f"{workspace_id}/{uuid.uuid4()}/{dashboard_name}",
+            storage_key=_blob(dashboard_bytes),
             file_type="view",
             content_text=dashboard_html,
             created_by_id=owner_id,
         )
         all_objects.append(dashboard)
 
-        # Bulk insert — single DB flush, no S3 writes
+        # Bulk insert — single DB flush
         db.add_all(all_objects)
         await db.flush()
+
+    # One reference per file; only blobs new to the store are uploaded
+    async with WriteBatch(storage) as batch:
+        for data, refs in blobs.values():
+            await blob_service.store_blob(db, batch, data, refs=refs)
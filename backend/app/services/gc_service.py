@@ -0,0 +1,240 @@
+"""Mark-and-sweep garbage collection for stored objects.
+
+Run periodically, e.g. ``python -m app.services.gc_service --dry-run``.
+
+1. Purge files soft-deleted longer than the retention period (if configured)
+   and drop ``blobs`` rows nobody references any more.
+2. Mark: collect every storage key still referenced by ``files``,
+   ``file_versions`` or ``blobs``.
+3. Sweep: list the backend and delete unreferenced objects older than the
+   grace period. The grace period protects uploads whose rows aren't committed
+   yet; each batch is re-checked against the database right before deleting.
+   Content-addressed objects can be re-uploaded under an old key at any time,
+   so their ``blobs`` rows stay locked from the re-check until the delete is
+   done and ``store_blob`` waits for the sweep instead of racing it.
+"""
+import argparse
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.filestore.base import StorageBackend
+from app.models.blob import Blob
+from app.models.file import File, FileVersion
+from app.services import blob_service
+
+logger = logging.getLogger(__name__)
+
+_SWEEP_BATCH = 500
+
+
+@dataclass
+class GCReport:
+    dry_run: bool
+    purged_files: int = 0
+    dropped_blob_rows: int = 0
+    scanned: int = 0
+    live: int = 0
+    too_recent: int = 0
+    deleted: int = 0
+    failed: int = 0
+    deleted_keys: list[str] = field(default_factory=list)
+
+
+async def purge_deleted_files(
+    db: AsyncSession, deleted_before: datetime, dry_run: bool = False
+) -> int:
+    """Hard-delete files soft-deleted before ``deleted_before`` and release their blobs."""
+    result = await db.execute(
+        select(File.id, File.storage_key).where(
+            File.deleted_at.is_not(None), File.deleted_at < deleted_before
+        )
+    )
+    files = result.all()
+    if not files or dry_run:
+        return len(files)
+
+    file_ids = [row.id for row in files]
+    refs = Counter(row.storage_key for row in files)
+    result = await db.execute(
+        select(FileVersion.storage_key).where(
+            FileVersion.file_id.in_(file_ids), FileVersion.storage_key.is_not(None)
+        )
+    )
+    refs.update(result.scalars().all())
+    for storage_key, count in refs.items():
+        await blob_service.release_blob(db, storage_key, refs=count)
+
+    # Versions, shares and views go with the rows (ON DELETE CASCADE)
+    await db.execute(delete(File).where(File.id.in_(file_ids)))
+    return len(files)
+
+
+async def drop_unreferenced_blobs(db: AsyncSession, dry_run: bool = False) -> int:
+    """Remove ``blobs`` rows with no references, leaving their objects to the sweep."""
+    if dry_run:
+        result = await db.execute(select(Blob.sha256).where(Blob.ref_count == 0))
+        return len(result.all())
+    result = await db.execute(
+        delete(Blob).where(Blob.ref_count == 0).returning(Blob.sha256)
+    )
+    return len(result.all())
+
+
+def _live_keys_query():
+    return union(
+        select(File.storage_key),
+        select(FileVersion.storage_key).where(FileVersion.storage_key.is_not(None)),
+        select(Blob.storage_key).where(Blob.ref_count > 0),
+    )
+
+
+async def mark_live_keys(db: AsyncSession) -> set[str]:
+    result = await db.execute(_live_keys_query())
+    return set(result.scalars().all())
+
+
+async def _still_unreferenced(db: AsyncSession, keys: list[str]) -> list[str]:
+    live = _live_keys_query().subquery()
+    result = await db.execute(select(live.c[0]).where(live.c[0].in_(keys)))
+    referenced = set(result.scalars().all())
+    return [key for key in keys if key not in referenced]
+
+
+async def _lock_blob_rows(db: AsyncSession, keys: list[str]) -> list[str]:
+    """Lock the ``blobs`` rows of the content-addressed ``keys``; returns their digests.
+
+    Keys without a row get a zero-reference placeholder, which also waits for
+    a ``store_blob`` that has inserted the row but not committed yet.
+    """
+    digests = sorted(
+        key.rsplit("/", 1)[-1] for key in keys
+        if blob_service.is_blob_key(key) and len(key.rsplit("/", 1)[-1]) == 64
+    )
+    if not digests:
+        return []
+    await db.execute(
+        insert(Blob)
+        .values([
+            {"sha256": d, "storage_key": blob_service.blob_key(d), "size_bytes": 0, "ref_count": 0}
+            for d in digests
+        ])
+        .on_conflict_do_nothing(index_elements=[Blob.sha256])
+    )
+    await db.execute(
+        select(Blob.sha256).where(Blob.sha256.in_(digests)).order_by(Blob.sha256).with_for_update()
+    )
+    return digests
+
+
+async def collect_garbage(
+    db: AsyncSession,
+    storage: StorageBackend,
+    grace_period: timedelta,
+    dry_run: bool = False,
+    deletes_per_second: float = 0,
+    deleted_retention: timedelta | None = None,
+) -> GCReport:
+    """Delete stored objects that no row references. See the module docstring."""
+    report = GCReport(dry_run=dry_run)
+    now = datetime.now(timezone.utc)
+
+    if deleted_retention is not None:
+        report.purged_files = await purge_deleted_files(db, now - deleted_retention, dry_run)
+    report.dropped_blob_rows = await drop_unreferenced_blobs(db, dry_run)
+    if not dry_run:
+        await db.commit()
+
+    live = await mark_live_keys(db)
+    report.live = len(live)
+
+    cutoff = now - grace_period
+    candidates: list[str] = []
+    async for key, last_modified in storage.list_keys():
+        report.scanned += 1
+        if key in live:
+            continue
+        if last_modified > cutoff:
+            report.too_recent += 1
+            continue
+        candidates.append(key)
+
+    for start in range(0, len(candidates), _SWEEP_BATCH):
+        batch = candidates[start:start + _SWEEP_BATCH]
+        digests = [] if dry_run else await _lock_blob_rows(db, batch)
+        batch = await _still_unreferenced(db, batch)
+        errors = {}
+        if batch and not dry_run:
+            result = await storage.delete_many(batch)
+            errors = result.errors
+            for key, error in errors.items():
+                logger.warning("Storage GC failed to delete %s: %s", key, error)
+        if digests:
+            # Unreferenced rows go with their objects; the next store_blob of
+            # the same bytes inserts a fresh row and uploads them again
+            await db.execute(
+                delete(Blob).where(Blob.sha256.in_(digests), Blob.ref_count == 0)
+            )
+            await db.commit()
+        if not batch:
+            continue
+        if not dry_run and deletes_per_second:
+            await asyncio.sleep(len(batch) / deletes_per_second)
+        report.failed += len(errors)
+        for key in batch:
+            if key not in errors:
+                report.deleted += 1
+                report.deleted_keys.append(key)
+
+    logger.info(
+        "Storage GC%s: scanned=%d live=%d too_recent=%d deleted=%d failed=%d "
+        "purged_files=%d dropped_blobs=%d",
+        " (dry run)" if dry_run else "",
+        report.scanned, report.live, report.too_recent, report.deleted, report.failed,
+        report.purged_files, report.dropped_blob_rows,
+    )
+    return report
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from app.database import async_session, engine
+    from app.dependencies import close_storage_backend, get_storage_backend
+
+    retention = (
+        timedelta(days=settings.storage_gc_deleted_retention_days)
+        if settings.storage_gc_deleted_retention_days
+        else None
+    )
+    try:
+        async with async_session() as db:
+            report = await collect_garbage(
+                db,
+                get_storage_backend(),
+                grace_period=timedelta(hours=args.grace_hours),
+                dry_run=args.dry_run,
+                deletes_per_second=args.deletes_per_second,
+                deleted_retention=retention,
+            )
+        for key in report.deleted_keys:
+            print(("would delete " if report.dry_run else "deleted ") + key)
+    finally:
+        await close_storage_backend()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete unreferenced storage objects")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    parser.add_argument("--grace-hours", type=float, default=settings.storage_gc_grace_hours)
+    parser.add_argument(
+        "--deletes-per-second", type=float, default=settings.storage_gc_deletes_per_second
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.marketplace import MarketplaceItem
 from app.filestore.base import StorageBackend
+from app.filestore.batch import WriteBatch
 from app.services import file_service
 
 
@@ -77,17 +78,18 @@ async def use_file_template(
     filename = content_data.get("filename", "untitled.txt")
     file_content = content_data.get("content", "")
 
-    file = await file_service.create_file_from_content(
-        db=db,
-        storage=storage,
-        workspace_id=workspace_id,
-        name=filename,
-        content=file_content,
-        owner_id=owner_id,
-        folder_id=folder_id,
-        created_by_id=owner_id,
-    )
-    await file_service.auto_create_instances_for_file(db, storage, file)
+    async with WriteBatch(storage) as batch:
+        file = await file_service.create_file_from_content(
+            db=db,
+            storage=batch,
+            workspace_id=workspace_id,
+            name=filename,
+            content=file_content,
+            owner_id=owner_id,
+            folder_id=folder_id,
+            created_by_id=owner_id,
+        )
+        await file_service.auto_create_instances_for_file(db, batch, file)
 
     item.install_count += 1
     await db.flush()
@@ -115,9 +117,11 @@ async def use_folder_template(
         parent_id=parent_folder_id,
     )
 
-    await _create_structure_recursive(
-        db, storage, workspace_id, owner_id, root_folder.id, structure
-    )
+    # All template files and their instances are written in one batch
+    async with WriteBatch(storage) as batch:
+        await _create_structure_recursive(
+            db, batch, workspace_id, owner_id, root_folder.id, structure
+        )
 
     item.install_count += 1
     await db.flush()
@@ -0,0 +1,177 @@
+import difflib
+import json
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.file import FileVersion
+
+# Reconstructed version texts keyed by FileVersion id. Versions are immutable
+# and ids are never reused (not even after a rollback), so entries never need
+# invalidating; the cache is bounded by size.
+_RECONSTRUCTION_CACHE_CHARS = 32 * 1024 * 1024
+_reconstructed: OrderedDict[uuid.UUID, str] = OrderedDict()
+_reconstructed_chars = 0
+
+
+def _cache_get(version_id: uuid.UUID) -> str | None:
+    text = _reconstructed.get(version_id)
+    if text is not None:
+        _reconstructed.move_to_end(version_id)
+    return text
+
+
+def _cache_put(version_id: uuid.UUID, text: str) -> None:
+    global _reconstructed_chars
+    if len(text) > _RECONSTRUCTION_CACHE_CHARS or version_id in _reconstructed:
+        return
+    _reconstructed[version_id] = text
+    _reconstructed_chars += len(text)
+    while _reconstructed_chars > _RECONSTRUCTION_CACHE_CHARS:
+        _, evicted = _reconstructed.popitem(last=False)
+        _reconstructed_chars -= len(evicted)
+
+
+def encode_delta(old: str, new: str) -> str:
+    """Encode ``new`` as line operations against ``old``.
+
+    The result is a JSON list of ``["=", n]`` (keep n lines), ``["-", n]``
+    (drop n lines) and ``["+", text]`` (insert text) operations.
+    """
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops: list[list] = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(["-", i2 - i1])
+        if j2 > j1:
+            ops.append(["+", "".join(b[j1:j2])])
+    return json.dumps(ops, separators=(",", ":"), ensure_ascii=False)
+
+
+def apply_delta(old: str, delta: str) -> str:
+    lines = old.splitlines(keepends=True)
+    pos = 0
+    out: list[str] = []
+    for op, arg in json.loads(delta):
+        if op == "=":
+            out.extend(lines[pos:pos + arg])
+            pos += arg
+        elif op == "-":
+            pos += arg
+        else:
+            out.append(arg)
+    return "".join(out)
+
+
+async def get_latest_version_number(db: AsyncSession, file_id: uuid.UUID) -> int:
+    result = await db.execute(
+        select(func.coalesce(func.max(FileVersion.version_number), 0)).where(
+            FileVersion.file_id == file_id
+        )
+    )
+    return result.scalar()
+
+
+async def get_version_content(
+    db: AsyncSession, file_id: uuid.UUID, version_number: int
+) -> str | None:
+    """Rebuild the text of a version from its nearest snapshot and the deltas after it.
+
+    Replay starts from the newest version in the chain that is already cached,
+    so only the deltas after it are loaded. Returns None if the version doesn't
+    exist or has no text (binary uploads).
+    """
+    snapshot_number = (
+        select(func.max(FileVersion.version_number))
+        .where(
+            FileVersion.file_id == file_id,
+            FileVersion.version_number <= version_number,
+            FileVersion.delta.is_(None),
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(FileVersion.id, FileVersion.version_number)
+        .where(
+            FileVersion.file_id == file_id,
+            FileVersion.version_number >= snapshot_number,
+            FileVersion.version_number <= version_number,
+        )
+        .order_by(FileVersion.version_number)
+    )
+    chain = result.all()
+    if not chain or chain[-1].version_number != version_number:
+        return None
+
+    text = None
+    start = 0
+    for i in range(len(chain) - 1, -1, -1):
+        text = _cache_get(chain[i].id)
+        if text is not None:
+            start = i + 1
+            break
+    if start == len(chain):
+        return text
+
+    result = await db.execute(
+        select(FileVersion.id, FileVersion.content_text, FileVersion.delta)
+        .where(FileVersion.id.in_([row.id for row in chain[start:]]))
+    )
+    rows = {row.id: row for row in result.all()}
+    for link in chain[start:]:
+        row = rows[link.id]
+        if text is None:
+            # The chain starts at a snapshot; binary snapshots have no text
+            text = row.content_text
+            if text is None:
+                return None
+        else:
+            text = apply_delta(text, row.delta)
+        _cache_put(link.id, text)
+    return text
+
+
+async def build_text_version(
+    db: AsyncSession, file_id: uuid.UUID, new_content: str
+) -> FileVersion:
+    """Build (without adding) the next version of a text file.
+
+    Every ``file_version_snapshot_interval`` versions, and whenever the
+    previous version can't be rebuilt or the delta wouldn't be smaller, the
+    version stores the full text. Otherwise it only stores a line delta against
+    the previous version. Snapshot versions get ``content_text`` set and need a
+    ``storage_key``; delta versions don't reference a blob.
+    """
+    previous = await get_latest_version_number(db, file_id)
+    version_number = previous + 1
+    size_bytes = len(new_content.encode("utf-8"))
+    version = FileVersion(
+        id=uuid.uuid4(),
+        file_id=file_id,
+        version_number=version_number,
+        size_bytes=size_bytes,
+    )
+
+    interval = max(settings.file_version_snapshot_interval, 1)
+    delta = None
+    if previous and (version_number - 1) % interval:
+        base = await get_version_content(db, file_id, previous)
+        if base is not None:
+            delta = encode_delta(base, new_content)
+            if len(delta) >= len(new_content):
+                delta = None
+
+    if delta is None:
+        version.content_text = new_content
+    else:
+        version.delta = delta
+    _cache_put(version.id, new_content)
+    return version
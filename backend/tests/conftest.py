@@ -0,0 +1,52 @@
+"""Shared fixtures.
+
+``database_url`` needs a scratch Postgres database named by ``TEST_DATABASE_URL``;
+tests using it are skipped when the variable is unset or the database can't be
+reached.
+"""
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import pool, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+async def _reachable(url: str) -> bool:
+    engine = create_async_engine(url, poolclass=pool.NullPool)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    if not asyncio.run(_reachable(TEST_DATABASE_URL)):
+        pytest.skip("test database is not reachable")
+
+    from alembic import command
+    from alembic.config import Config
+
+    # alembic/env.py takes the URL from the settings
+    database_url = settings.database_url
+    settings.database_url = TEST_DATABASE_URL
+    try:
+        config = Config(str(BACKEND_DIR / "alembic.ini"))
+        config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+        command.upgrade(config, "head")
+    finally:
+        settings.database_url = database_url
+    return TEST_DATABASE_URL
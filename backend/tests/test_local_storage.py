@@ -0,0 +1,26 @@
+"""Key listing in the local storage backend."""
+import uuid
+
+from app.filestore.local import LocalStorageBackend
+from app.filestore.packfile import PackfileStorageBackend
+
+
+async def test_list_keys_skips_directories_that_are_not_objects(tmp_path):
+    storage = LocalStorageBackend(str(tmp_path))
+    await storage.put("cas/ab/abcdef", b"blob")
+    # Written by the pre-sharding layout, directly under the base path
+    legacy = f"{uuid.uuid4()}/{uuid.uuid4()}/notes.txt"
+    (tmp_path / legacy).parent.mkdir(parents=True)
+    (tmp_path / legacy).write_bytes(b"legacy")
+    # A pack directory configured inside the storage path
+    pack = PackfileStorageBackend(
+        storage, path=str(tmp_path / "pack"), max_object_bytes=1024, segment_bytes=1 << 20
+    )
+    await pack.put("small", b"x")
+    (tmp_path / "stray.txt").write_bytes(b"not an object")
+
+    keys = sorted([key async for key, _ in storage.list_keys()])
+    await pack.close()
+
+    assert keys == sorted(["cas/ab/abcdef", legacy])
+    assert await storage.get(legacy) == b"legacy"
@@ -0,0 +1,104 @@
+"""Packfile storage shared between processes, and its interplay with the wrapped backend."""
+import pytest
+
+from app.filestore.memory import InMemoryStorageBackend
+from app.filestore.packfile import PackfileStorageBackend
+
+SMALL = b"s" * 100
+LARGE = b"L" * 2048
+
+
+def _pack(path, backend=None, segment_bytes=1 << 20) -> PackfileStorageBackend:
+    return PackfileStorageBackend(
+        backend or InMemoryStorageBackend(),
+        path=str(path),
+        max_object_bytes=1024,
+        segment_bytes=segment_bytes,
+        compact_interval=3600,
+    )
+
+
+@pytest.fixture
+async def pack(tmp_path):
+    storage = _pack(tmp_path)
+    yield storage
+    await storage.close()
+
+
+async def test_small_objects_are_packed(pack):
+    await pack.put("small", SMALL)
+    await pack.put("large", LARGE)
+
+    assert await pack.get("small") == SMALL
+    assert await pack.get("large") == LARGE
+    assert not await pack.backend.exists("small")
+    assert await pack.backend.get("large") == LARGE
+
+
+async def test_delete_after_shrinking_put_removes_large_copy(pack):
+    await pack.put("key", LARGE)
+    await pack.put("key", SMALL)
+    assert await pack.get("key") == SMALL
+
+    await pack.delete("key")
+
+    assert await pack.get("key") is None
+    assert not await pack.exists("key")
+    assert [key async for key, _ in pack.list_keys()] == []
+
+
+async def test_processes_share_a_pack_directory(tmp_path):
+    # Each instance stands in for a process: its own index, lock descriptor
+    # and file handles over the same directory
+    first = _pack(tmp_path)
+    second = _pack(tmp_path)
+    try:
+        await first.put("a", SMALL)
+        assert await second.get("a") == SMALL
+
+        await second.put("b", b"b" * 10)
+        await second.delete("a")
+        assert await first.get("a") is None
+        assert await first.get("b") == b"b" * 10
+        assert sorted([key async for key, _ in first.list_keys()]) == ["b"]
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_compaction_in_one_process_is_seen_by_another(tmp_path):
+    first = _pack(tmp_path, segment_bytes=500)
+    second = _pack(tmp_path, segment_bytes=500)
+    try:
+        items = {f"k{i}": bytes([i]) * 100 for i in range(20)}
+        await first.put_many(items)
+        # Make the early segments mostly dead
+        await first.delete_many([f"k{i}" for i in range(0, 20, 3) if i < 15] + ["k1", "k4"])
+        assert await second.get("k2") == items["k2"]
+
+        await first.compact()
+        assert first.stats()["pack_compactions"] > 0
+
+        for key, data in items.items():
+            expected = None if key in {"k0", "k3", "k6", "k9", "k12", "k1", "k4"} else data
+            assert await second.get(key) == expected
+        await second.put("new", b"n" * 10)
+        assert await first.get("new") == b"n" * 10
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_index_survives_restart(tmp_path):
+    storage = _pack(tmp_path)
+    await storage.put("kept", SMALL)
+    await storage.put("gone", SMALL)
+    await storage.delete("gone")
+    await storage.close()
+
+    reopened = _pack(tmp_path)
+    try:
+        assert await reopened.get("kept") == SMALL
+        assert await reopened.get("gone") is None
+    finally:
+        await reopened.close()
@@ -0,0 +1,131 @@
+"""ensure_system_folders records the Files folder on the workspace.
+
+Needs ``TEST_DATABASE_URL`` (see conftest.py); everything runs in a
+transaction that is rolled back.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import pool, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models.file import File
+from app.models.folder import Folder
+from app.models.workspace import Workspace
+from app.services import file_service
+
+SEED_SQL = [
+    """
+    INSERT INTO users (id, email, display_name, is_active, is_verified)
+    VALUES (:user_id, 'system-folders@example.com', 'Folders', true, true)
+    """,
+    """
+    INSERT INTO workspaces (id, name, slug, owner_id)
+    VALUES (:workspace_id, 'Drive', 'system-folders-drive', :user_id)
+    """,
+    # Two orphaned root files, one in the trash, one already in a folder
+    """
+    INSERT INTO folders (id, workspace_id, name, path, owner_id)
+    VALUES (:other_folder_id, :workspace_id, 'Other', '/Other', :user_id)
+    """,
+    """
+    INSERT INTO files (
+        id, owner_id, workspace_id, folder_id, name, mime_type, size_bytes, storage_key,
+        file_type, is_vibe_file, created_by_agent, is_favorite, is_instance, deleted_at
+    )
+    SELECT gen_random_uuid(), :user_id, :workspace_id,
+           CASE WHEN g = 4 THEN CAST(:other_folder_id AS uuid) END,
+           'file' || g, 'text/plain', 1, 'system-folders/' || g, 'other',
+           false, false, false, false, CASE WHEN g = 3 THEN now() END
+    FROM generate_series(1, 4) g
+    """,
+]
+
+
+@pytest.fixture
+async def db(database_url):
+    engine = create_async_engine(database_url, poolclass=pool.NullPool)
+    ids = {
+        "user_id": uuid.uuid4(),
+        "workspace_id": uuid.uuid4(),
+        "other_folder_id": uuid.uuid4(),
+    }
+    file_service._files_folder_cache.clear()
+    async with AsyncSession(engine) as session:
+        for statement in SEED_SQL:
+            await session.execute(text(statement), ids)
+        session.info["ids"] = ids
+        yield session
+        await session.rollback()
+    file_service._files_folder_cache.clear()
+    await engine.dispose()
+
+
+async def _files_by_name(db: AsyncSession, workspace_id: uuid.UUID) -> dict[str, uuid.UUID | None]:
+    result = await db.execute(
+        select(File.name, File.folder_id).where(File.workspace_id == workspace_id)
+    )
+    return dict(result.all())
+
+
+async def test_first_call_creates_folder_and_rehomes_orphans(db):
+    ids = db.info["ids"]
+
+    folder_id = await file_service.ensure_system_folders(db, ids["workspace_id"], ids["user_id"])
+
+    folder = await db.get(Folder, folder_id)
+    assert (folder.name, folder.parent_id) == ("Files", None)
+    marker = await db.scalar(
+        select(Workspace.files_folder_id).where(Workspace.id == ids["workspace_id"])
+    )
+    assert marker == folder_id
+    assert await _files_by_name(db, ids["workspace_id"]) == {
+        "file1": folder_id,
+        "file2": folder_id,
+        "file3": None,
+        "file4": ids["other_folder_id"],
+    }
+
+
+async def test_marker_is_used_once_recorded(db):
+    ids = db.info["ids"]
+    folder_id = await file_service.ensure_system_folders(db, ids["workspace_id"], ids["user_id"])
+    # A file created at the root afterwards isn't swept up by later calls
+    await db.execute(
+        text(
+            "INSERT INTO files (id, owner_id, workspace_id, name, mime_type, size_bytes,"
+            " storage_key, file_type, is_vibe_file, created_by_agent, is_favorite, is_instance)"
+            " VALUES (gen_random_uuid(), :user_id, :workspace_id, 'late', 'text/plain', 1,"
+            " 'system-folders/late', 'other', false, false, false, false)"
+        ),
+        ids,
+    )
+
+    assert await file_service.ensure_system_folders(
+        db, ids["workspace_id"], ids["user_id"]
+    ) == folder_id
+    assert (await _files_by_name(db, ids["workspace_id"]))["late"] is None
+
+
+async def test_uncommitted_folder_is_not_cached(db):
+    ids = db.info["ids"]
+
+    # The second call reads the marker back, but it is not committed yet
+    await file_service.ensure_system_folders(db, ids["workspace_id"], ids["user_id"])
+    await file_service.ensure_system_folders(db, ids["workspace_id"], ids["user_id"])
+
+    assert file_service._files_folder_cache.get(ids["workspace_id"]) is None
+
+
+async def test_recorded_marker_is_cached(db):
+    ids = db.info["ids"]
+    folder_id = ids["other_folder_id"]
+    await db.execute(
+        text("UPDATE workspaces SET files_folder_id = :other_folder_id WHERE id = :workspace_id"),
+        ids,
+    )
+
+    assert await file_service.ensure_system_folders(
+        db, ids["workspace_id"], ids["user_id"]
+    ) == folder_id
+    assert file_service._files_folder_cache.get(ids["workspace_id"]) == folder_id
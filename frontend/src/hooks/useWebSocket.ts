@@ -130,6 +130,22 @@ export function useWebSocket() {
           }
           break;
 
+        // One event for a whole bulk move/delete/restore/copy
+        case 'files.batch': {
+          qc.invalidateQueries({ queryKey: ['drive-files'] });
+          qc.invalidateQueries({ queryKey: ['recent-files'] });
+          qc.invalidateQueries({ queryKey: ['favorite-files'] });
+          qc.invalidateQueries({ queryKey: ['file-instances'] });
+          const fileIds = (data.payload?.file_ids as string[] | undefined) ?? [];
+          if (data.payload?.action === 'deleted') {
+            const { selectedFileId, clearSelectedFile } = useDriveStore.getState();
+            if (selectedFileId && fileIds.includes(selectedFileId)) {
+              clearSelectedFile();
+            }
+          }
+          break;
+        }
+
         case 'folder.created':
         case 'folder.updated':
         case 'folder.deleted':